@@ -0,0 +1,116 @@
+# Benchmark of firewall connection to console event matching.
+#
+#   python benchmarks/bench_adaptive_timedelta_sync.py [--events 10000] [--connections 10000]
+#
+# Compares cloud_logging.adaptive_timedelta_sync (bisect over a sorted event index)
+# with the original linear scan on the same random fixtures, and checks both assign
+# the same IP address and source port to every event.
+
+import argparse
+import asyncio
+import copy
+import random
+import time
+
+from datetime import datetime, timedelta, timezone
+from bench_settings import use_placeholder_settings
+
+use_placeholder_settings()
+
+from utils import cloud_logging
+
+
+async def linear_adaptive_timedelta_sync(console_log_data, connection_attributes):
+    threshold = timedelta(seconds=1)
+
+    for connection in connection_attributes:
+        connection_timestamp = connection.get("timestamp")
+
+        for i, console_log_event in enumerate(console_log_data):
+            console_event_timestamp = console_log_event.get("Timestamp")
+            next_adjacent_difference = timedelta(seconds=2)
+
+            if i + 1 < len(console_log_data):
+                next_console_event_timestamp = console_log_data[i + 1].get("Timestamp")
+                next_adjacent_difference = abs(
+                    next_console_event_timestamp - console_event_timestamp
+                )
+
+            if next_adjacent_difference > timedelta(seconds=1):
+                if abs(connection_timestamp - console_event_timestamp) <= threshold:
+                    console_log_event["IP Address"] = connection["src_ip"]
+                    console_log_event["Source Port"] = int(connection["src_port"])
+
+                    break
+
+            elif (
+                next_adjacent_difference == timedelta(seconds=1)
+                and connection_timestamp == console_event_timestamp
+            ):
+                console_log_event["IP Address"] = connection["src_ip"]
+                console_log_event["Source Port"] = int(connection["src_port"])
+
+                break
+
+    return console_log_data
+
+
+def create_fixtures(event_count, connection_count, seed):
+    random_source = random.Random(seed)
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    console_log_data = []
+    event_time = start_time
+    for _ in range(event_count):
+        # Mix of simultaneous, adjacent and isolated connections.
+        event_time += timedelta(seconds=random_source.choice([0, 1, 1, 2, 3, 5, 30]))
+        console_log_data.append({"Timestamp": event_time})
+
+    span = int((event_time - start_time).total_seconds())
+    connection_attributes = [
+        {
+            "timestamp": start_time
+            + timedelta(seconds=random_source.randint(0, span)),
+            "src_ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "src_port": str(1024 + i % 60000),
+        }
+        for i in range(connection_count)
+    ]
+
+    return console_log_data, connection_attributes
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    arguments = parser.parse_args()
+
+    console_log_data, connection_attributes = create_fixtures(
+        arguments.events, arguments.connections, arguments.seed
+    )
+
+    linear_data = copy.deepcopy(console_log_data)
+    started = time.perf_counter()
+    await linear_adaptive_timedelta_sync(linear_data, connection_attributes)
+    linear_time = time.perf_counter() - started
+
+    indexed_data = copy.deepcopy(console_log_data)
+    started = time.perf_counter()
+    console_event_index = await cloud_logging.create_console_event_index(indexed_data)
+    await cloud_logging.adaptive_timedelta_sync(
+        console_event_index=console_event_index,
+        connection_attributes=connection_attributes,
+    )
+    indexed_time = time.perf_counter() - started
+
+    print(
+        f"{arguments.events} events x {arguments.connections} connections: "
+        f"linear {linear_time:.3f}s, indexed {indexed_time:.4f}s "
+        f"({linear_time / indexed_time:.0f}x), identical: {linear_data == indexed_data}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
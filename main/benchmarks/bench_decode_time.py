@@ -0,0 +1,170 @@
+# Micro-benchmark of console log time decoding and parsing throughput.
+#
+#   python benchmarks/bench_decode_time.py [--lines 300000]
+#
+# Times console_log_parser.decode_time against datetime.strptime on the timestamps
+# of a synthetic console log, then times parse_log against the original
+# strptime-based parse_log on the same log, and checks both pairs agree.
+
+import argparse
+import asyncio
+import random
+import re
+import time
+
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+from bench_settings import use_placeholder_settings
+
+use_placeholder_settings()
+
+from utils import console_log_parser
+
+time_pattern = re.compile(r"(\s*\d{1,2}:\d{2}:\d{2}),?")
+player_connecting_pattern = re.compile(r"Player\s+(.*?)\s+connecting")
+player_connected_pattern = re.compile(r"Player\s+.*?\s+connected\s+\(id=(.*?)\)\.")
+
+
+async def strptime_convert_to_datetime(time_str, start_date, microseconds=0):
+    time_obj = datetime.strptime(time_str, "%H:%M:%S").time()
+
+    return datetime.combine(start_date, time_obj).replace(
+        microsecond=microseconds, tzinfo=timezone.utc
+    )
+
+
+async def strptime_parse_log(log_file, start_date):
+    connecting_players = {}
+    console_log_data = []
+
+    first_line = log_file.readline()
+    first_time_match = time_pattern.match(first_line)
+    if first_time_match:
+        first_time_str = first_time_match.group(1).strip()
+        previous_time = datetime.strptime(first_time_str, "%H:%M:%S").time()
+
+    else:
+        previous_time = datetime.min.time()
+
+    log_file.seek(0)
+
+    for line in log_file:
+        time_match = time_pattern.match(line)
+        if time_match:
+            time_str = time_match.group(1).strip()
+            content_start_pos = time_match.end()
+            content = line[content_start_pos:].strip()
+            current_time = datetime.strptime(time_str, "%H:%M:%S").time()
+            if current_time < previous_time:
+                start_date += timedelta(days=1)
+
+            previous_time = current_time
+        else:
+            time_str = ""
+            content = line.strip()
+
+        player_connecting_match = player_connecting_pattern.search(content)
+        if player_connecting_match:
+            player_name = player_connecting_match.group(1)
+            connecting_players[player_name] = time_str
+            continue
+
+        player_connected_match = player_connected_pattern.search(content)
+        if player_connected_match:
+            steam_id = player_connected_match.group(1)
+            for player_name, connect_time_str in connecting_players.items():
+                steam_link = f"https://steamcommunity.com/profiles/{steam_id}"
+                connect_datetime_obj = await strptime_convert_to_datetime(
+                    connect_time_str, start_date
+                )
+
+                console_log_data.append(
+                    {
+                        "Timestamp": connect_datetime_obj,
+                        "Time": connect_time_str,
+                        "Content": content,
+                        "Player": player_name,
+                        "Steam ID": steam_id,
+                        "Steam Link": steam_link,
+                    }
+                )
+                break
+
+            connecting_players.pop(player_name, None)
+
+    return console_log_data
+
+
+def create_console_log(line_count, seed):
+    random_source = random.Random(seed)
+    seconds = 0
+    lines = []
+    for i in range(line_count):
+        seconds = (seconds + random_source.choice([0, 0, 0, 1, 2])) % 86400
+        time_str = f"{seconds // 3600:2d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+        line_type = random_source.random()
+        if line_type < 0.01:
+            lines.append(f"{time_str} Player P{i} connecting.\n")
+
+        elif line_type < 0.02:
+            lines.append(f"{time_str} Player P{i} connected (id={i}).\n")
+
+        else:
+            lines.append(f"{time_str} Server noise line {i}\n")
+
+    return lines
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=300000)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    lines = create_console_log(arguments.lines, arguments.seed)
+    time_strs = [line[:8].strip() for line in lines]
+
+    started = time.perf_counter()
+    strptime_times = [datetime.strptime(time_str, "%H:%M:%S").time() for time_str in time_strs]
+    strptime_time = time.perf_counter() - started
+
+    console_log_parser.decoded_times.clear()
+    started = time.perf_counter()
+    decoded_times = [console_log_parser.decode_time(time_str) for time_str in time_strs]
+    decode_time = time.perf_counter() - started
+
+    identical = all(
+        parsed.hour * 3600 + parsed.minute * 60 + parsed.second == decoded
+        for parsed, decoded in zip(strptime_times, decoded_times)
+    )
+
+    print(
+        f"{len(time_strs)} timestamps: strptime {strptime_time:.3f}s, "
+        f"decode_time {decode_time:.3f}s ({strptime_time / decode_time:.0f}x), identical: {identical}"
+    )
+
+    console_log = "".join(lines)
+    started = time.perf_counter()
+    strptime_log_data = await strptime_parse_log(
+        log_file=StringIO(console_log), start_date=date(2024, 1, 1)
+    )
+    strptime_parse_time = time.perf_counter() - started
+
+    console_log_parser.decoded_times.clear()
+    started = time.perf_counter()
+    console_log_data = await console_log_parser.parse_log(
+        log_file=StringIO(console_log), start_date=date(2024, 1, 1)
+    )
+    parse_time = time.perf_counter() - started
+
+    print(
+        f"parse_log: {len(lines)} lines, {len(console_log_data)} event(s): "
+        f"strptime {strptime_parse_time:.3f}s ({len(lines) / strptime_parse_time:,.0f} lines/s), "
+        f"current {parse_time:.3f}s ({len(lines) / parse_time:,.0f} lines/s), "
+        f"{strptime_parse_time / parse_time:.1f}x, identical: {console_log_data == strptime_log_data}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+# Enrichment benchmark against a local stand-in for ipinfo.io and vpnapi.io.
+#
+#   python benchmarks/bench_enrichment_stand_in.py [--events 500] [--unique-ips 200] [--batch-size 0]
+#
+# Serves both providers from 127.0.0.1 under a path prefix, so IPINFO_URL/VPNIO_URL
+# prefixes are exercised, and answers 429 whenever a provider's rate limit is exceeded.
+# Reports request counts, peak concurrency, 429s and how many events were enriched.
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from aiohttp import web
+from bench_settings import use_placeholder_settings
+
+STAND_IN_PREFIX = "/stand-in"
+
+stand_in_state = {
+    provider: {"requests": 0, "rejected": 0, "in_flight": 0, "peak": 0, "window": []}
+    for provider in ("ipinfo", "vpnapi")
+}
+
+
+def ip_attributes(ip_address):
+    return {
+        "ip": ip_address,
+        "city": "Stand-in City",
+        "region": "Stand-in Region",
+        "postal": "00000",
+        "loc": "0.0000,0.0000",
+        "org": "AS0 Stand-in",
+        "country": "XX",
+    }
+
+
+async def serve(provider, rate_limit, payload):
+    provider_state = stand_in_state[provider]
+    provider_state["requests"] += 1
+
+    # Sliding one-second window; the client bucket may burst up to one second of tokens.
+    now = time.monotonic()
+    provider_state["window"] = [
+        requested for requested in provider_state["window"] if now - requested < 1
+    ]
+    if len(provider_state["window"]) >= max(rate_limit, 1) * 2:
+        provider_state["rejected"] += 1
+        return web.json_response(
+            {"error": "rate limited"}, status=429, headers={"Retry-After": "1"}
+        )
+
+    provider_state["window"].append(now)
+    provider_state["in_flight"] += 1
+    provider_state["peak"] = max(provider_state["peak"], provider_state["in_flight"])
+    try:
+        await asyncio.sleep(random.uniform(0.01, 0.05))
+        return web.json_response(payload)
+
+    finally:
+        provider_state["in_flight"] -= 1
+
+
+def create_stand_in(ipinfo_rate_limit, vpnio_rate_limit):
+    async def ipinfo_lookup(request):
+        payload = ip_attributes(request.match_info["ip_address"])
+        return await serve("ipinfo", ipinfo_rate_limit, payload)
+
+    async def ipinfo_batch(request):
+        payload = {
+            ip_address: ip_attributes(ip_address) for ip_address in await request.json()
+        }
+        return await serve("ipinfo", ipinfo_rate_limit, payload)
+
+    async def vpnapi_lookup(request):
+        payload = {
+            "ip": request.match_info["ip_address"],
+            "security": {"vpn": False, "proxy": False, "tor": False, "relay": False},
+        }
+        return await serve("vpnapi", vpnio_rate_limit, payload)
+
+    app = web.Application()
+    app.router.add_post(f"{STAND_IN_PREFIX}/ipinfo/batch", ipinfo_batch)
+    app.router.add_get(f"{STAND_IN_PREFIX}/ipinfo/{{ip_address}}", ipinfo_lookup)
+    app.router.add_get(f"{STAND_IN_PREFIX}/vpnapi/{{ip_address}}", vpnapi_lookup)
+    return app
+
+
+def create_events(events, unique_ips):
+    ip_addresses = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(unique_ips)]
+    return [
+        {"Player": f"Player{i}", "IP Address": random.choice(ip_addresses)}
+        for i in range(events)
+    ]
+
+
+async def run_benchmark(arguments):
+    runner = web.AppRunner(
+        create_stand_in(arguments.ipinfo_rate_limit, arguments.vpnio_rate_limit)
+    )
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", arguments.port)
+    await site.start()
+
+    # settings reads these at import, so log_enrichment is only imported once they are set.
+    stand_in_url = f"http://127.0.0.1:{arguments.port}{STAND_IN_PREFIX}"
+    os.environ["IPINFO_URL"] = f"{stand_in_url}/ipinfo/"
+    os.environ["VPNIO_URL"] = f"{stand_in_url}/vpnapi/"
+    os.environ["IPINFO_RATE_LIMIT"] = str(arguments.ipinfo_rate_limit)
+    os.environ["VPNIO_RATE_LIMIT"] = str(arguments.vpnio_rate_limit)
+    os.environ["ENRICHMENT_BATCH_SIZE"] = str(arguments.batch_size)
+    os.environ.pop("ENRICHMENT_CACHE_PATH", None)
+    use_placeholder_settings()
+
+    from utils import log_enrichment
+
+    ip_log_data = create_events(arguments.events, arguments.unique_ips)
+    try:
+        started = time.perf_counter()
+        await log_enrichment.enrich_data(ip_log_data)
+        elapsed_time = time.perf_counter() - started
+
+    finally:
+        if log_enrichment.http_session is not None:
+            await log_enrichment.http_session.close()
+
+        await runner.cleanup()
+
+    enriched_events = sum(
+        1 for event in ip_log_data if "Country" in event and "VPN" in event
+    )
+
+    print(
+        f"{arguments.events} events, {arguments.unique_ips} unique IPs, "
+        f"batch size {arguments.batch_size}: {elapsed_time:.3f}s"
+    )
+    for provider, provider_state in stand_in_state.items():
+        print(
+            f"{provider}: {provider_state['requests']} request(s), "
+            f"{provider_state['rejected']} rate limited, peak concurrency {provider_state['peak']}"
+        )
+
+    print(f"enriched events: {enriched_events}/{arguments.events}")
+    return enriched_events == arguments.events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--unique-ips", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=0)
+    parser.add_argument("--ipinfo-rate-limit", type=float, default=50)
+    parser.add_argument("--vpnio-rate-limit", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8787)
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    if not asyncio.run(run_benchmark(arguments)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Startup benchmark and import-time profile for the bot process.
+#
+#   python benchmarks/bench_startup.py [--runs 5] [--top 25]
+#
+# Imports `main` in fresh interpreters (no Discord connection is made), reports the
+# median wall time, the slowest imports from `python -X importtime`, and whether the
+# heavy optional libraries were loaded at startup. Missing required settings are
+# filled with placeholders; credentials are only parsed on first use.
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_settings import MAIN_DIRECTORY, use_placeholder_settings
+
+DEFERRED_MODULES = ["paramiko", "cryptography", "grpc", "google.api_core", "google.cloud"]
+
+LOADED_MODULES_SCRIPT = (
+    "import sys, main; "
+    f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+)
+
+
+def run_python(arguments):
+    # Child interpreters inherit the placeholder settings from os.environ.
+    return subprocess.run(
+        [sys.executable] + arguments,
+        cwd=MAIN_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure_startup(runs):
+    startup_times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_python(["-c", "import main"])
+        startup_times.append(time.perf_counter() - started)
+
+    return startup_times
+
+
+def profile_imports(top):
+    completed = run_python(["-X", "importtime", "-c", "import main"])
+
+    import_times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        # Lines look like "import time:   self_us | cumulative_us |   package.module".
+        self_time, cumulative_time, module_name = [
+            field.strip() for field in line.split(":", 1)[1].split("|")
+        ]
+        import_times.append((int(cumulative_time), int(self_time), module_name))
+
+    import_times.sort(reverse=True)
+    return import_times[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    arguments = parser.parse_args()
+
+    use_placeholder_settings()
+
+    startup_times = measure_startup(arguments.runs)
+    print(
+        f"import main: median {statistics.median(startup_times):.3f}s "
+        f"min {min(startup_times):.3f}s over {arguments.runs} run(s)"
+    )
+
+    loaded_modules = run_python(["-c", LOADED_MODULES_SCRIPT]).stdout.strip()
+    print(f"deferred modules loaded at startup: {loaded_modules or 'none'}")
+
+    print(f"\n{'cumulative us':>14} {'self us':>10}  module")
+    for cumulative_time, self_time, module_name in profile_imports(arguments.top):
+        print(f"{cumulative_time:>14} {self_time:>10}  {module_name}")
+
+
+if __name__ == "__main__":
+    main()
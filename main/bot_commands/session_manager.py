@@ -5,17 +5,36 @@ from utils import (
     cloud_storage,
     natops_session,
     connecting_event,
+    console_log_parser,
+    discord_delivery,
     message_formatting,
 )
 
 logger = logging.getLogger(__name__)
-server_start_timestamp = None
+server_start_timestamps = {}
 session_startup_in_progress = set()
 session_running = set()
 
 
-async def logic(discord_client, ctx, argument: str):
-    instance = await compute_engine.get_instance(discord_client=discord_client)
+async def get_session_key(instance):
+    # Parser state, stored events and notifications are per instance and session.
+    server_start_timestamp = server_start_timestamps.get(instance["instance_name"])
+    if not server_start_timestamp:
+        return None
+
+    return (instance["instance_name"], server_start_timestamp)
+
+
+async def logic(discord_client, ctx, argument: str, selector=None):
+    instance = await compute_engine.get_instance(
+        discord_client=discord_client, selector=selector
+    )
+
+    if not instance:
+        message = await message_formatting.create_no_instance_message(selector)
+        await ctx.send(content=message)
+
+        return
 
     if argument == "start":
         async with ctx.typing():
@@ -132,10 +151,17 @@ async def logic(discord_client, ctx, argument: str):
 
                 logger.info(logger_info_message)
 
+                server_start_timestamp = server_start_timestamps.get(
+                    instance["instance_name"]
+                )
+
                 server_start_datetime = await message_formatting.format_start_datetime(
                     server_start_timestamp
                 )
 
+                session_key = await get_session_key(instance)
+                await console_log_parser.discard_parser_state(session_key)
+
                 message = "Reading NATOPS console log from cloud storage..."
                 logger_info_message = (
                     await message_formatting.create_logger_info_message(
@@ -148,7 +174,7 @@ async def logic(discord_client, ctx, argument: str):
 
                 logger.info(logger_info_message)
 
-                console_log_file = await cloud_storage.read_log(
+                console_log_file = cloud_storage.stream_log(
                     discord_client=discord_client,
                     server_start_datetime=server_start_datetime,
                 )
@@ -172,6 +198,8 @@ async def logic(discord_client, ctx, argument: str):
                     instance=instance,
                     console_log_file=console_log_file,
                     server_start_date=server_start_datetime["start_date_object"],
+                    flag="archive",
+                    session_key=session_key,
                 )
 
                 if isinstance(event_log, str):
@@ -181,14 +209,16 @@ async def logic(discord_client, ctx, argument: str):
 
                         return
 
-                for event in event_log:
-                    embed = await message_formatting.create_log_event_embed(
-                        log_data=event
-                    )
+                embeds = [
+                    await message_formatting.create_log_event_embed(log_data=event)
+                    for event in event_log
+                ]
 
-                    await ctx.send(embed=embed)
+                delivery_report = await discord_delivery.send_embeds(
+                    destination=ctx, embeds=embeds
+                )
 
-                message = f"{len(event_log)} event(s) data sent."
+                message = f"{len(event_log)} event(s) data sent in {delivery_report['messages']} message(s)."
                 logger_info_message = (
                     await message_formatting.create_logger_info_message(
                         command=argument,
@@ -1,6 +1,11 @@
 import logging
 
-from utils import compute_engine, connecting_event, message_formatting
+from utils import (
+    compute_engine,
+    connecting_event,
+    discord_delivery,
+    message_formatting,
+)
 
 from bot_commands import session_manager
 from settings import GOOGLE_CLOUD_PROJECT
@@ -9,7 +14,7 @@ logger = logging.getLogger(__name__)
 
 
 async def inactive_session_message(argument, instance):
-    text = "NATOPS session is not running."
+    text = f'NATOPS session is not running on `{instance["instance_name"]}`.'
     logger_info_message = await message_formatting.create_logger_info_message(
         command=argument,
         message=text,
@@ -21,8 +26,18 @@ async def inactive_session_message(argument, instance):
     return message
 
 
-async def logic(discord_client, ctx, argument: str):
-    instance = await compute_engine.get_instance(discord_client=discord_client)
+async def logic(discord_client, ctx, argument: str, sort_by="score", selector=None):
+    instances = await compute_engine.get_instances(
+        discord_client=discord_client, selector=selector
+    )
+
+    if not instances:
+        message = await message_formatting.create_no_instance_message(selector)
+        await ctx.send(content=message)
+
+        return
+
+    instance = instances[0]
 
     if argument == "player":
         if instance["instance_name"] in session_manager.session_running:
@@ -39,34 +54,48 @@ async def logic(discord_client, ctx, argument: str):
 
                 logger.info(logger_info_message)
 
-                console_log_file = await compute_engine.read_console_log(
-                    discord_client=discord_client, instance=instance
+                server_start_timestamp = session_manager.server_start_timestamps.get(
+                    instance["instance_name"]
                 )
 
-                server_start_datetime = await message_formatting.format_start_datetime(
-                    session_manager.server_start_timestamp
+                session_key = await session_manager.get_session_key(instance)
+                console_log_lock = await compute_engine.get_console_log_lock(
+                    instance=instance, session_key=session_key
                 )
 
-                message = "Parsing NATOPS console log..."
-                logger_info_message = (
-                    await message_formatting.create_logger_info_message(
-                        command=argument,
-                        message=message,
-                        instance_name=instance["instance_name"],
-                        zone=instance["zone"],
+                async with console_log_lock:
+                    console_log_read = await compute_engine.read_console_log(
+                        discord_client=discord_client,
+                        instance=instance,
+                        session_key=session_key,
                     )
-                )
 
-                logger.info(logger_info_message)
-                await ctx.send(content=message)
-
-                event_log = await connecting_event.construct_event_log(
-                    discord_client=discord_client,
-                    argument=argument,
-                    instance=instance,
-                    console_log_file=console_log_file,
-                    server_start_date=server_start_datetime["start_date_object"],
-                )
+                    server_start_datetime = await message_formatting.format_start_datetime(
+                        server_start_timestamp
+                    )
+
+                    message = "Parsing NATOPS console log..."
+                    logger_info_message = (
+                        await message_formatting.create_logger_info_message(
+                            command=argument,
+                            message=message,
+                            instance_name=instance["instance_name"],
+                            zone=instance["zone"],
+                        )
+                    )
+
+                    logger.info(logger_info_message)
+                    await ctx.send(content=message)
+
+                    event_log = await connecting_event.construct_event_log(
+                        discord_client=discord_client,
+                        argument=argument,
+                        instance=instance,
+                        console_log_file=console_log_read["console_log_file"],
+                        server_start_date=server_start_datetime["start_date_object"],
+                        session_key=session_key,
+                        log_offset=console_log_read["log_offset"],
+                    )
 
                 if isinstance(event_log, str):
                     if event_log == "No player connected.":
@@ -75,14 +104,16 @@ async def logic(discord_client, ctx, argument: str):
 
                         return
 
-                for event in event_log:
-                    embed = await message_formatting.create_log_event_embed(
-                        log_data=event
-                    )
+                embeds = [
+                    await message_formatting.create_log_event_embed(log_data=event)
+                    for event in event_log
+                ]
 
-                    await ctx.send(embed=embed)
+                delivery_report = await discord_delivery.send_embeds(
+                    destination=ctx, embeds=embeds
+                )
 
-                message = f"{len(event_log)} event(s) data sent."
+                message = f"{len(event_log)} event(s) data sent in {delivery_report['messages']} message(s)."
                 logger_info_message = (
                     await message_formatting.create_logger_info_message(
                         command=argument,
@@ -110,47 +141,66 @@ async def logic(discord_client, ctx, argument: str):
     elif argument == "server":
         async with ctx.typing():
             message = "Health check..."
-            logger_info_message = await message_formatting.create_logger_info_message(
-                command=argument,
-                message=message,
-                instance_name=instance["instance_name"],
-                zone=instance["zone"],
-            )
+            for instance in instances:
+                logger_info_message = (
+                    await message_formatting.create_logger_info_message(
+                        command=argument,
+                        message=message,
+                        instance_name=instance["instance_name"],
+                        zone=instance["zone"],
+                    )
+                )
 
-            logger.info(logger_info_message)
+                logger.info(logger_info_message)
 
-            instance_attributes = await compute_engine.health_check(
-                discord_client=discord_client, instance=instance, flag="query-natops"
+            fleet_attributes = await compute_engine.fleet_health_check(
+                discord_client=discord_client, instances=instances, flag="query-natops"
             )
 
-            if not instance_attributes.get("natops_session"):
-                message = await inactive_session_message(
-                    argument=argument, instance=instance
-                )
+            for instance, instance_attributes in fleet_attributes:
+                if isinstance(instance_attributes, Exception):
+                    logger.error(
+                        f"Health check failed for {instance['instance_name']}: {instance_attributes}"
+                    )
 
-                logger.info(message["logger_info_message"])
-                await ctx.send(content=message["message"])
+                    message = f'Health check failed for `{instance["instance_name"]}` in `{instance["zone"]}`.'
+                    await ctx.send(content=message)
 
-                return
+                    continue
 
-            await ctx.send(embed=instance_attributes["natops_session"]["session_embed"])
+                if not instance_attributes.get("natops_session"):
+                    message = await inactive_session_message(
+                        argument=argument, instance=instance
+                    )
 
-            if instance_attributes["natops_session"].get("players_embed"):
-                players_embed = instance_attributes["natops_session"]["players_embed"]
-                for embed in players_embed:
-                    await ctx.send(embed=embed)
+                    logger.info(message["logger_info_message"])
+                    await ctx.send(content=message["message"])
 
-                message = f"{len(players_embed)} player score embed(s) sent."
-                logger_info_message = (
-                    await message_formatting.create_logger_info_message(
-                        command=argument,
-                        message=message,
-                        instance_name=instance["instance_name"],
-                        zone=instance["zone"],
-                    )
+                    continue
+
+                natops_players = instance_attributes["natops_session"].get("players", [])
+                players_embed = await message_formatting.create_scoreboard_embeds(
+                    players=natops_players, sort_by=sort_by
                 )
 
-                logger.info(logger_info_message)
+                await discord_delivery.send_embeds(
+                    destination=ctx,
+                    embeds=[instance_attributes["natops_session"]["session_embed"]]
+                    + players_embed,
+                )
+
+                if players_embed:
+                    message = f"{len(natops_players)} player score(s) sent in {len(players_embed)} scoreboard page(s)."
+                    logger_info_message = (
+                        await message_formatting.create_logger_info_message(
+                            command=argument,
+                            message=message,
+                            instance_name=instance["instance_name"],
+                            zone=instance["zone"],
+                        )
+                    )
+
+                    logger.info(logger_info_message)
 
             return
 
@@ -1,10 +1,14 @@
+import time
+
+startup_started = time.perf_counter()
+
 import logging
 import discord
 import error_handling
 import webserver
 
 from bot_commands import session_manager, session_status, natops_help
-from utils import compute_engine, message_formatting
+from utils import compute_engine, message_formatting, webhook_handler
 from discord.ext import commands, tasks
 from settings import BOT_TOKEN
 
@@ -19,37 +23,37 @@ task_memory = {}
 
 @tasks.loop(seconds=300)
 async def instance_health_check_worker(discord_client):
-    instance = await compute_engine.get_instance(discord_client=discord_client)
+    instances = await compute_engine.get_instances(discord_client=discord_client)
     message = "Health check..."
-    logger_info_message = await message_formatting.create_logger_info_message(
-        command="service-worker",
-        message=message,
-        instance_name=instance["instance_name"],
-        zone=instance["zone"],
+    for instance in instances:
+        logger_info_message = await message_formatting.create_logger_info_message(
+            command="service-worker",
+            message=message,
+            instance_name=instance["instance_name"],
+            zone=instance["zone"],
+        )
+
+        logger.info(logger_info_message)
+
+    fleet_attributes = await compute_engine.fleet_health_check(
+        discord_client=discord_client,
+        instances=instances,
+        flag="query-natops",
+        max_staleness=0,
     )
 
-    logger.info(logger_info_message)
-    instance_attributes = await compute_engine.health_check(
-        discord_client=discord_client, instance=instance, flag="query-natops"
-    )
+    for instance, instance_attributes in fleet_attributes:
+        if isinstance(instance_attributes, Exception):
+            logger.error(
+                f"[service-worker] Health check failed for {instance['instance_name']}: {instance_attributes}"
+            )
 
-    return instance_attributes
+    return fleet_attributes
 
 
 @tasks.loop(seconds=82800)
 async def webhook_rotation_worker(task_memory, discord_client):
-    webhook_server = task_memory.get("webhook_server")
-    if webhook_server:
-        message = "[service-worker] Rotating webhook server..."
-        logger.info(message)
-
-        webhook_server.close()
-        await webhook_server.wait_closed()
-        del task_memory["webhook_server"]
-
-    await webserver.webhook_health_check(
-        task_memory=task_memory, discord_client=discord_client
-    )
+    await webserver.rotate_webhook(task_memory=task_memory, discord_client=discord_client)
 
 
 @client.event
@@ -60,6 +64,14 @@ async def on_ready():
     if not webhook_rotation_worker.is_running():
         webhook_rotation_worker.start(task_memory=task_memory, discord_client=client)
 
+    if not task_memory.get("webhook_spool_replayed"):
+        task_memory["webhook_spool_replayed"] = True
+        await webhook_handler.replay_spool(discord_client=client)
+
+    if not task_memory.get("startup_time"):
+        task_memory["startup_time"] = time.perf_counter() - startup_started
+        logger.info(f"Startup to ready took {task_memory['startup_time']:.2f}s.")
+
     logger.info(
         f"natops-manager running as {client.user.name} ({client.user.id})\n------"
     )
@@ -69,18 +81,37 @@ async def on_ready():
 
 
 @client.command(pass_context=True)
-async def session(ctx, argument: str):
+async def session(ctx, argument: str, selector: str = None):
     if argument in ["start", "stop"]:
-        await session_manager.logic(discord_client=client, ctx=ctx, argument=argument)
+        await session_manager.logic(
+            discord_client=client, ctx=ctx, argument=argument, selector=selector
+        )
 
     else:
         raise discord.ext.commands.BadArgument
 
 
 @client.command(pass_context=True)
-async def status(ctx, argument: str):
+async def status(ctx, argument: str, *options: str):
+    sort_by = "score"
+    selector = None
+
+    # Options may name a sort key, an instance or a zone in any order.
+    for option in options:
+        if option in ["score", "uptime"]:
+            sort_by = option
+
+        else:
+            selector = option
+
     if argument in ["player", "server"]:
-        await session_status.logic(discord_client=client, ctx=ctx, argument=argument)
+        await session_status.logic(
+            discord_client=client,
+            ctx=ctx,
+            argument=argument,
+            sort_by=sort_by,
+            selector=selector,
+        )
 
     else:
         raise discord.ext.commands.BadArgument
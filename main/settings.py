@@ -1,13 +1,14 @@
 import base64
 import json
+import threading
 
 from os import environ
 from io import StringIO
-from google.oauth2 import service_account
-from paramiko import RSAKey
 
 
 def load_gcp_key(gcp_key_string):
+    from google.oauth2 import service_account
+
     gcp_key_string = base64.b64decode(gcp_key_string).decode("utf-8")
     gcp_key = json.loads(gcp_key_string)
     gcp_credential = service_account.Credentials.from_service_account_info(gcp_key)
@@ -15,6 +16,8 @@ def load_gcp_key(gcp_key_string):
 
 
 def load_ssh_key(ssh_key_string):
+    from paramiko import RSAKey
+
     private_key_string = base64.b64decode(ssh_key_string).decode("utf-8")
     private_key_obj = StringIO(private_key_string)
     private_key = RSAKey.from_private_key(file_obj=private_key_obj)
@@ -25,7 +28,6 @@ MAINTAINER_ID = environ["MAINTAINER_ID"]
 BOT_TOKEN = environ["BOT_TOKEN"]
 GOOGLE_CLOUD_PROJECT = environ["GOOGLE_CLOUD_PROJECT"]
 FIREWALL_NAME = environ["FIREWALL_NAME"]
-SSH_KEY = load_ssh_key(ssh_key_string=environ["SSH_KEY"])
 IPINFO_TOKEN = environ["IPINFO_TOKEN"]
 VPNIO_TOKEN = environ["VPNIO_TOKEN"]
 WEBHOOK_PORT = environ["WEBHOOK_PORT"]
@@ -34,6 +36,42 @@ WEBHOOK_AUTH_PASSWORD = environ["WEBHOOK_AUTH_PASSWORD"]
 AUTHORIZED_CHANNELS = [
     int(channel) for channel in environ["AUTHORIZED_CHANNELS"].split(",")
 ]
+CONSOLE_LOG_COMPRESSION = environ.get("CONSOLE_LOG_COMPRESSION", "gzip")
+CONSOLE_LOG_CHUNK_SIZE = int(environ.get("CONSOLE_LOG_CHUNK_SIZE", 1048576))
+INSTANCE_REGISTRY_TTL = int(environ.get("INSTANCE_REGISTRY_TTL", 300))
+INSTANCE_STATE_STALENESS = int(environ.get("INSTANCE_STATE_STALENESS", 10))
+GCP_EXECUTOR_WORKERS = int(environ.get("GCP_EXECUTOR_WORKERS", 4))
+GCP_OPERATION_POLL_INTERVAL = int(environ.get("GCP_OPERATION_POLL_INTERVAL", 2))
+FIREWALL_LOG_PAGE_SIZE = int(environ.get("FIREWALL_LOG_PAGE_SIZE", 1000))
+FIREWALL_LOG_FIELDS = environ.get(
+    "FIREWALL_LOG_FIELDS", "entries.timestamp,entries.json_payload,next_page_token"
+)
+FIREWALL_CACHE_SETTLE_SECONDS = int(environ.get("FIREWALL_CACHE_SETTLE_SECONDS", 300))
+FIREWALL_CACHE_RETENTION = int(environ.get("FIREWALL_CACHE_RETENTION", 172800))
+EVENT_STORE_PATH = environ.get("EVENT_STORE_PATH", "natops_events.db")
+CHANNEL_QUEUE_SIZE = int(environ.get("CHANNEL_QUEUE_SIZE", 100))
+CHANNEL_DROP_POLICY = environ.get("CHANNEL_DROP_POLICY", "drop-oldest")
+WEBHOOK_COALESCE_SECONDS = float(environ.get("WEBHOOK_COALESCE_SECONDS", 5))
+WEBHOOK_SPOOL_PATH = environ.get("WEBHOOK_SPOOL_PATH", "webhook_spool.jsonl")
+WEBHOOK_SPOOL_HISTORY = int(environ.get("WEBHOOK_SPOOL_HISTORY", 1000))
+WEBHOOK_RETRY_LIMIT = int(environ.get("WEBHOOK_RETRY_LIMIT", 3))
+A2S_CACHE_TTL = float(environ.get("A2S_CACHE_TTL", 5))
+SCOREBOARD_PAGE_SIZE = int(environ.get("SCOREBOARD_PAGE_SIZE", 40))
+FLEET_CONCURRENCY = int(environ.get("FLEET_CONCURRENCY", 4))
+WEBHOOK_TLS_MODE = environ.get("WEBHOOK_TLS_MODE", "off")
+WEBHOOK_TLS_CERTFILE = environ.get("WEBHOOK_TLS_CERTFILE")
+WEBHOOK_TLS_KEYFILE = environ.get("WEBHOOK_TLS_KEYFILE")
+WEBHOOK_DRAIN_TIMEOUT = float(environ.get("WEBHOOK_DRAIN_TIMEOUT", 10))
+ENRICHMENT_CACHE_SIZE = int(environ.get("ENRICHMENT_CACHE_SIZE", 4096))
+ENRICHMENT_CACHE_TTL = int(environ.get("ENRICHMENT_CACHE_TTL", 86400))
+ENRICHMENT_CACHE_PATH = environ.get("ENRICHMENT_CACHE_PATH")
+ENRICHMENT_CONCURRENCY = int(environ.get("ENRICHMENT_CONCURRENCY", 8))
+ENRICHMENT_BATCH_SIZE = int(environ.get("ENRICHMENT_BATCH_SIZE", 0))
+ENRICHMENT_RETRY_LIMIT = int(environ.get("ENRICHMENT_RETRY_LIMIT", 3))
+IPINFO_URL = environ.get("IPINFO_URL", "http://ipinfo.io/")
+IPINFO_RATE_LIMIT = float(environ.get("IPINFO_RATE_LIMIT", 10))
+VPNIO_URL = environ.get("VPNIO_URL", "https://vpnapi.io/api/")
+VPNIO_RATE_LIMIT = float(environ.get("VPNIO_RATE_LIMIT", 2))
 
 gcp_credentials = [
     "GOOGLE_COMPUTE_ENGINE",
@@ -41,6 +79,19 @@ gcp_credentials = [
     "GOOGLE_CLOUD_LOGGING",
 ]
 
-gcp_keys = {credential: credential for credential in gcp_credentials}
-for credential, key in gcp_keys.items():
-    globals()[credential] = load_gcp_key(gcp_key_string=environ[key])
+# Keys are read at import so a missing variable still fails fast, but parsed on first use.
+key_loaders = {"SSH_KEY": load_ssh_key}
+key_loaders.update({credential: load_gcp_key for credential in gcp_credentials})
+key_strings = {key: environ[key] for key in key_loaders}
+key_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name not in key_loaders:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with key_lock:
+        if name not in globals():
+            globals()[name] = key_loaders[name](key_strings[name])
+
+    return globals()[name]
@@ -1,27 +1,34 @@
 import logging
-from google.cloud import logging_v2
-from settings import GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_LOGGING, FIREWALL_NAME
+import time
+from bisect import bisect_left, bisect_right
+from settings import (
+    GOOGLE_CLOUD_PROJECT,
+    FIREWALL_NAME,
+    FIREWALL_LOG_PAGE_SIZE,
+    FIREWALL_LOG_FIELDS,
+)
 from datetime import timedelta
+from utils import gcp_clients, firewall_cache, metrics
 
 logger = logging.getLogger(__name__)
-cloud_logging = logging_v2.Client(credentials=GOOGLE_CLOUD_LOGGING)
 
 
 async def create_filter_time_range(console_log_data):
-    filter_timestamp_format = "%Y-%m-%dT%H:%M:%S.%fZ"
     filter_time_range = {
-        "min_time": (console_log_data[0]["Timestamp"] - timedelta(seconds=1)).strftime(
-            filter_timestamp_format
-        ),
-        "max_time": (
-            console_log_data[-1]["Timestamp"] + timedelta(microseconds=999999)
-        ).strftime(filter_timestamp_format),
+        "min_time": console_log_data[0]["Timestamp"] - timedelta(seconds=1),
+        "max_time": console_log_data[-1]["Timestamp"],
     }
 
     return filter_time_range
 
 
-async def get_firewall_log(discord_client, min_time, max_time):
+async def stream_firewall_log(min_time, max_time):
+    filter_timestamp_format = "%Y-%m-%dT%H:%M:%S.%fZ"
+    min_time = min_time.strftime(filter_timestamp_format)
+    max_time = (max_time + timedelta(microseconds=999999)).strftime(
+        filter_timestamp_format
+    )
+
     filter_ = (
         f"logName:(projects/{GOOGLE_CLOUD_PROJECT}/logs/compute.googleapis.com%2Ffirewall) "
         f'AND jsonPayload.rule_details.reference:("network:default/firewall:{FIREWALL_NAME}") '
@@ -32,78 +39,156 @@ async def get_firewall_log(discord_client, min_time, max_time):
 
     project_name = f"projects/{GOOGLE_CLOUD_PROJECT}"
 
-    firewall_log_entries = await discord_client.loop.run_in_executor(
-        executor=None,
-        func=lambda: cloud_logging.list_entries(
-            resource_names=[project_name], filter_=filter_
-        ),
+    page_started = time.perf_counter()
+    logging_client = await gcp_clients.get_logging_client()
+    firewall_log_entries = await logging_client.list_log_entries(
+        request={
+            "resource_names": [project_name],
+            "filter": filter_,
+            "page_size": FIREWALL_LOG_PAGE_SIZE,
+        },
+        metadata=[("x-goog-fieldmask", FIREWALL_LOG_FIELDS)],
     )
 
-    connection_attributes = []
+    # Yield each page as soon as it arrives so matching overlaps with fetching the next one.
+    async for firewall_log_page in firewall_log_entries.pages:
+        metrics.observe_stage("firewall_fetch", time.perf_counter() - page_started)
+        connection_attributes = []
 
-    for log_entry in firewall_log_entries:
-        connection_data = log_entry.payload.get("connection", {})
-        src_ip = connection_data.get("src_ip")
-        src_port = connection_data.get("src_port")
+        for log_entry in firewall_log_page.entries:
+            connection_data = log_entry.json_payload.get("connection", {})
+            src_ip = connection_data.get("src_ip")
+            src_port = connection_data.get("src_port")
 
-        data_dict = {
-            "timestamp": log_entry.timestamp.replace(microsecond=0),
-            "src_ip": src_ip,
-            "src_port": src_port,
-        }
+            data_dict = {
+                "timestamp": log_entry.timestamp.replace(microsecond=0),
+                "src_ip": src_ip,
+                "src_port": src_port,
+            }
 
-        connection_attributes.append(data_dict)
+            connection_attributes.append(data_dict)
 
-    return connection_attributes
+        yield connection_attributes
+        page_started = time.perf_counter()
 
 
-async def adaptive_timedelta_sync(console_log_data, connection_attributes):
-    threshold = timedelta(seconds=1)
+async def create_console_event_index(console_log_data):
+    window_events = []
+    exact_events = []
 
-    for connection in connection_attributes:
-        connection_timestamp = connection.get("timestamp")
+    for i, console_log_event in enumerate(console_log_data):
+        console_event_timestamp = console_log_event.get("Timestamp")
+        next_adjacent_difference = timedelta(seconds=2)
 
-        for i, console_log_event in enumerate(console_log_data):
-            console_event_timestamp = console_log_event.get("Timestamp")
-            next_adjacent_difference = timedelta(seconds=2)
+        if i + 1 < len(console_log_data):
+            next_console_event_timestamp = console_log_data[i + 1].get("Timestamp")
+            next_adjacent_difference = abs(
+                next_console_event_timestamp - console_event_timestamp
+            )
 
-            if i + 1 < len(console_log_data):
-                next_console_event_timestamp = console_log_data[i + 1].get("Timestamp")
-                next_adjacent_difference = abs(
-                    next_console_event_timestamp - console_event_timestamp
-                )
+        # Isolated events match within the threshold, events one second apart only match exactly.
+        if next_adjacent_difference > timedelta(seconds=1):
+            window_events.append((console_event_timestamp, i))
 
-            if next_adjacent_difference > timedelta(seconds=1):
-                if abs(connection_timestamp - console_event_timestamp) <= threshold:
-                    console_log_event["IP Address"] = connection["src_ip"]
-                    console_log_event["Source Port"] = int(connection["src_port"])
+        elif next_adjacent_difference == timedelta(seconds=1):
+            exact_events.append((console_event_timestamp, i))
 
-                    break
+    window_events.sort()
+    exact_events.sort()
 
-            elif (
-                next_adjacent_difference == timedelta(seconds=1)
-                and connection_timestamp == console_event_timestamp
-            ):
-                console_log_event["IP Address"] = connection["src_ip"]
-                console_log_event["Source Port"] = int(connection["src_port"])
+    console_event_index = {
+        "console_log_data": console_log_data,
+        "window_timestamps": [event[0] for event in window_events],
+        "window_indexes": [event[1] for event in window_events],
+        "exact_timestamps": [event[0] for event in exact_events],
+        "exact_indexes": [event[1] for event in exact_events],
+    }
 
-                break
+    return console_event_index
 
-    ip_log_data = console_log_data
-    return ip_log_data
 
+async def match_connection(console_event_index, connection, threshold):
+    connection_timestamp = connection.get("timestamp")
+
+    window_timestamps = console_event_index["window_timestamps"]
+    lower = bisect_left(window_timestamps, connection_timestamp - threshold)
+    upper = bisect_right(window_timestamps, connection_timestamp + threshold)
+    candidates = console_event_index["window_indexes"][lower:upper]
+
+    exact_timestamps = console_event_index["exact_timestamps"]
+    lower = bisect_left(exact_timestamps, connection_timestamp)
+    upper = bisect_right(exact_timestamps, connection_timestamp)
+    candidates += console_event_index["exact_indexes"][lower:upper]
 
-async def create_ip_log_data(discord_client, console_log_data):
-    filter_time_range = await create_filter_time_range(console_log_data)
+    # The earliest event in log order wins, as with a linear scan.
+    if candidates:
+        console_log_event = console_event_index["console_log_data"][min(candidates)]
+        console_log_event["IP Address"] = connection["src_ip"]
+        console_log_event["Source Port"] = int(connection["src_port"])
 
-    connection_attributes = await get_firewall_log(
-        discord_client=discord_client,
+
+async def adaptive_timedelta_sync(console_event_index, connection_attributes):
+    threshold = timedelta(seconds=1)
+
+    with metrics.measure_stage("ip_correlation"):
+        for connection in connection_attributes:
+            await match_connection(
+                console_event_index=console_event_index,
+                connection=connection,
+                threshold=threshold,
+            )
+
+    ip_log_data = console_event_index["console_log_data"]
+    return ip_log_data
+
+
+async def create_ip_log_data(discord_client, console_log_data, time_range_data=None):
+    filter_time_range = await create_filter_time_range(
+        time_range_data or console_log_data
+    )
+    console_event_index = await create_console_event_index(console_log_data)
+    time_ranges = await firewall_cache.plan_time_ranges(
         min_time=filter_time_range["min_time"],
         max_time=filter_time_range["max_time"],
     )
 
-    ip_log_data = await adaptive_timedelta_sync(
-        console_log_data=console_log_data, connection_attributes=connection_attributes
+    connection_count = 0
+    fetched_count = 0
+
+    # Ranges are walked in time order so later connections still override earlier matches.
+    for time_range in time_ranges:
+        if time_range["covered"]:
+            connection_attributes = await firewall_cache.get_records(
+                min_time=time_range["min_time"], max_time=time_range["max_time"]
+            )
+
+            connection_count += len(connection_attributes)
+            await adaptive_timedelta_sync(
+                console_event_index=console_event_index,
+                connection_attributes=connection_attributes,
+            )
+
+            continue
+
+        async for connection_attributes in stream_firewall_log(
+            min_time=time_range["min_time"], max_time=time_range["max_time"]
+        ):
+            connection_count += len(connection_attributes)
+            fetched_count += len(connection_attributes)
+            await firewall_cache.add_records(connection_attributes)
+            await adaptive_timedelta_sync(
+                console_event_index=console_event_index,
+                connection_attributes=connection_attributes,
+            )
+
+        await firewall_cache.mark_covered(
+            min_time=time_range["min_time"], max_time=time_range["max_time"]
+        )
+
+    await firewall_cache.prune_records()
+    logger.info(
+        f"Matched {connection_count} firewall connection(s), {fetched_count} fetched from cloud logging."
     )
 
+    ip_log_data = console_log_data
     return ip_log_data
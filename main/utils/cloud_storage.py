@@ -1,31 +1,74 @@
 import logging
+import asyncio
+import gzip
 
-from google.cloud import storage
-from io import StringIO
-from settings import GOOGLE_CLOUD_STORAGE
+from io import TextIOWrapper
+from utils import gcp_clients
+from settings import CONSOLE_LOG_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
-storage_client = storage.Client(credentials=GOOGLE_CLOUD_STORAGE)
 bucket_name = "natops-logs"
 
 
-async def read_log(discord_client, server_start_datetime):
-    bucket = await discord_client.loop.run_in_executor(
-        executor=None, func=lambda: storage_client.get_bucket(bucket_name)
+async def get_log_blob(server_start_datetime):
+    bucket = await gcp_clients.run_blocking(
+        func=lambda: gcp_clients.storage_client.get_bucket(bucket_name)
     )
 
     log_filename = (
         f'logs/{server_start_datetime["date"]}/{server_start_datetime["time"]}.log'
     )
 
-    logger.info(f"log file: {log_filename}")
-    blob = await discord_client.loop.run_in_executor(
-        executor=None,
-        func=lambda: bucket.get_blob(log_filename),
-    )
+    for blob_name in [log_filename, f"{log_filename}.gz"]:
+        blob = await gcp_clients.run_blocking(
+            func=lambda: bucket.get_blob(blob_name),
+        )
 
-    blob_data = await discord_client.loop.run_in_executor(
-        executor=None, func=lambda: StringIO(blob.download_as_string().decode("utf-8"))
-    )
+        if blob:
+            logger.info(f"log file: {blob_name}")
+            return blob
+
+    raise FileNotFoundError(f"Console log archive {log_filename} not found.")
+
+
+async def open_log_reader(blob):
+    # Raw download keeps gzip-encoded objects compressed on the wire; they are inflated while reading.
+    blob_reader = blob.open("rb", chunk_size=CONSOLE_LOG_CHUNK_SIZE, raw_download=True)
+
+    if blob.content_encoding == "gzip" or blob.name.endswith(".gz"):
+        blob_reader = gzip.GzipFile(fileobj=blob_reader, mode="rb")
+
+    log_reader = TextIOWrapper(blob_reader, encoding="utf-8", newline="\n")
+    return log_reader
+
+
+async def stream_log(discord_client, server_start_datetime):
+    blob = await get_log_blob(server_start_datetime)
+    log_reader = await open_log_reader(blob)
+
+    try:
+        # Fetch the next chunk while the caller parses the current one.
+        next_lines = asyncio.ensure_future(
+            gcp_clients.run_blocking(
+                func=lambda: log_reader.readlines(CONSOLE_LOG_CHUNK_SIZE)
+            )
+        )
+
+        while True:
+            lines = await next_lines
+            if not lines:
+                break
+
+            next_lines = asyncio.ensure_future(
+                gcp_clients.run_blocking(
+                    func=lambda: log_reader.readlines(CONSOLE_LOG_CHUNK_SIZE)
+                )
+            )
+
+            yield lines
+
+    finally:
+        if not next_lines.done():
+            await asyncio.wait([next_lines])
 
-    return blob_data
+        await gcp_clients.run_blocking(func=log_reader.close)
@@ -1,35 +1,106 @@
 import logging
-
-from google.cloud import compute_v1
-from settings import GOOGLE_COMPUTE_ENGINE, GOOGLE_CLOUD_PROJECT
-from utils import instance_ssh, natops_session
+import asyncio
+import gzip
+import shlex
+import time
+
+from settings import (
+    GOOGLE_CLOUD_PROJECT,
+    CONSOLE_LOG_COMPRESSION,
+    INSTANCE_REGISTRY_TTL,
+    INSTANCE_STATE_STALENESS,
+    GCP_OPERATION_POLL_INTERVAL,
+    FLEET_CONCURRENCY,
+)
+from utils import (
+    gcp_clients,
+    console_log_parser,
+    instance_ssh,
+    metrics,
+    natops_session,
+)
 from bot_commands import session_manager
 from io import StringIO
 
 logger = logging.getLogger(__name__)
 
-compute_client = compute_v1.InstancesClient(credentials=GOOGLE_COMPUTE_ENGINE)
-operation_client = compute_v1.ZoneOperationsClient(credentials=GOOGLE_COMPUTE_ENGINE)
 server_startup_in_progress = set()
 server_shutdown_in_progress = set()
+console_log_locks = {}
+instance_registry = {"instances": [], "updated": None, "refresh_task": None}
+instance_snapshots = {}
+snapshot_requests = {}
 
 label_key = "classification"
 label_value = "natops"
 
-async def health_check(discord_client, instance, flag=None):
+async def fetch_instance_info(discord_client, instance):
+    try:
+        with metrics.measure_stage("gce_operation", operation="get"):
+            instance_info = await gcp_clients.run_blocking(
+                func=lambda: gcp_clients.compute_client.get(
+                    project=GOOGLE_CLOUD_PROJECT,
+                    zone=instance["zone"],
+                    instance=instance["instance_name"],
+                ),
+            )
+
+    except Exception as e:
+        # google.api_core is already loaded by the client call here, so this import stays off the startup path.
+        from google.api_core.exceptions import NotFound
+
+        if isinstance(e, NotFound):
+            await invalidate_instance_registry()
+
+        raise
+
+    finally:
+        snapshot_request = snapshot_requests.get(instance["instance_name"])
+        if snapshot_request and snapshot_request["task"] is asyncio.current_task():
+            del snapshot_requests[instance["instance_name"]]
+
+    instance_snapshots[instance["instance_name"]] = {
+        "instance_info": instance_info,
+        "updated": time.monotonic(),
+    }
+
+    return instance_info
+
+
+async def get_instance_info(
+    discord_client, instance, max_staleness=INSTANCE_STATE_STALENESS
+):
+    now = time.monotonic()
+    snapshot = instance_snapshots.get(instance["instance_name"])
+    if snapshot and now - snapshot["updated"] <= max_staleness:
+        return snapshot["instance_info"]
+
+    # Join a request already in flight unless it started too long ago to be fresh enough.
+    snapshot_request = snapshot_requests.get(instance["instance_name"])
+    if not snapshot_request or now - snapshot_request["started"] > max_staleness:
+        snapshot_request = {
+            "task": discord_client.loop.create_task(
+                fetch_instance_info(discord_client=discord_client, instance=instance)
+            ),
+            "started": now,
+        }
+        snapshot_requests[instance["instance_name"]] = snapshot_request
+
+    instance_info = await asyncio.shield(snapshot_request["task"])
+    return instance_info
+
+
+async def health_check(
+    discord_client, instance, flag=None, max_staleness=INSTANCE_STATE_STALENESS
+):
     instance_attributes = {}
-    instance_info = await discord_client.loop.run_in_executor(
-        executor=None,
-        func=lambda: compute_client.get(
-            project=GOOGLE_CLOUD_PROJECT,
-            zone=instance["zone"],
-            instance=instance["instance_name"],
-        ),
+    instance_info = await get_instance_info(
+        discord_client=discord_client, instance=instance, max_staleness=max_staleness
     )
 
     instance_attributes["instance_status"] = instance_info.status
 
-    if instance_info.status == compute_v1.Instance.Status.RUNNING.name:
+    if instance_info.status == "RUNNING":
         instance_ip = instance_info.network_interfaces[0].access_configs[0].nat_i_p
         instance_attributes["instance_ip"] = instance_ip
 
@@ -45,29 +116,75 @@ async def health_check(discord_client, instance, flag=None):
             
             instance_attributes["natops_session"] = natops_embed
 
-            if not session_manager.server_start_timestamp:
-                await instance_ssh.remote_exec(discord_client=discord_client, instance_ip=instance_ip, commands=["./get_start_timestamp"])
+            if not session_manager.server_start_timestamps.get(instance["instance_name"]):
+                await instance_ssh.remote_exec(discord_client=discord_client, instance_ip=instance_ip, commands=["./get_start_timestamp"], instance_name=instance["instance_name"])
 
             if instance["instance_name"] not in server_shutdown_in_progress:
                 session_manager.session_running.add(instance["instance_name"])
 
     elif instance_info.status  in [
-        compute_v1.Instance.Status.STOPPED.name,
-        compute_v1.Instance.Status.TERMINATED.name,
+        "STOPPED",
+        "TERMINATED",
     ]:
         
         session_manager.session_running.discard(instance["instance_name"])
 
     return instance_attributes
 
-async def operation_result(discord_client, operation_name, instance):
-    operation_result = await discord_client.loop.run_in_executor(
-        executor=None,
-        func=lambda: operation_client.wait(
-            project=GOOGLE_CLOUD_PROJECT, zone=instance["zone"], operation=operation_name
+
+async def map_fleet(instances, func):
+    fleet_semaphore = asyncio.Semaphore(FLEET_CONCURRENCY)
+
+    async def run_bounded(instance):
+        async with fleet_semaphore:
+            return await func(instance)
+
+    # One failing instance must not abort the sweep over the rest of the fleet.
+    fleet_results = await asyncio.gather(
+        *[run_bounded(instance) for instance in instances], return_exceptions=True
+    )
+
+    return list(zip(instances, fleet_results))
+
+
+async def fleet_health_check(
+    discord_client, instances, flag=None, max_staleness=INSTANCE_STATE_STALENESS
+):
+    fleet_attributes = await map_fleet(
+        instances=instances,
+        func=lambda instance: health_check(
+            discord_client=discord_client,
+            instance=instance,
+            flag=flag,
+            max_staleness=max_staleness,
         ),
     )
 
+    return fleet_attributes
+
+async def wait_for_operation(operation_name, instance):
+    # Poll instead of blocking a worker thread on ZoneOperationsClient.wait.
+    while True:
+        operation = await gcp_clients.run_blocking(
+            func=lambda: gcp_clients.operation_client.get(
+                project=GOOGLE_CLOUD_PROJECT,
+                zone=instance["zone"],
+                operation=operation_name,
+            ),
+        )
+
+        # Operation.status is an enum, unlike Instance.status which is a plain string.
+        if operation.status.name == "DONE":
+            return operation
+
+        await asyncio.sleep(GCP_OPERATION_POLL_INTERVAL)
+
+
+async def operation_result(discord_client, operation_name, instance):
+    operation_result = await wait_for_operation(
+        operation_name=operation_name, instance=instance
+    )
+
     if operation_result.error:
         logger.error(operation_result.error)
         message = {
@@ -78,7 +195,9 @@ async def operation_result(discord_client, operation_name, instance):
         return message
 
     else:
-        instance_attributes = await health_check(discord_client=discord_client, instance=instance)
+        instance_attributes = await health_check(
+            discord_client=discord_client, instance=instance, max_staleness=0
+        )
 
         message = {
             "status": "success",
@@ -88,26 +207,87 @@ async def operation_result(discord_client, operation_name, instance):
         return message
 
 
-async def get_instance(discord_client):
-    all_instances = await discord_client.loop.run_in_executor(
-        executor=None,
-        func=lambda: compute_client.aggregated_list(project=GOOGLE_CLOUD_PROJECT),
+async def list_instances(discord_client):
+    request = {
+        "project": GOOGLE_CLOUD_PROJECT,
+        "filter": f"labels.{label_key}={label_value}",
+    }
+
+    # The pager fetches pages lazily, so iterate it in the executor as well.
+    instances_list = await gcp_clients.run_blocking(
+        func=lambda: [
+            {"instance_name": instance.name, "zone": zone.split("/")[-1]}
+            for zone, instances_scoped_list in gcp_clients.compute_client.aggregated_list(
+                request=request
+            )
+            if instances_scoped_list.instances
+            for instance in instances_scoped_list.instances
+            if instance.labels
+            and label_key in instance.labels
+            and instance.labels[label_key] == label_value
+        ],
     )
 
-    instances_list = [
-        {"instance_name": instance.name, "zone": zone.split("/")[-1]}
-        for zone, instances_scoped_list in all_instances
-        if instances_scoped_list.instances
-        for instance in instances_scoped_list.instances
-        if instance.labels
-        and label_key in instance.labels
-        and instance.labels[label_key] == label_value
+    return instances_list
+
+
+async def refresh_instance_registry(discord_client):
+    try:
+        instances_list = await list_instances(discord_client=discord_client)
+        instance_registry["instances"] = instances_list
+        instance_registry["updated"] = time.monotonic()
+
+        return instances_list
+
+    finally:
+        instance_registry["refresh_task"] = None
+
+
+async def invalidate_instance_registry():
+    instance_registry["updated"] = None
+
+
+async def get_instance_registry(discord_client):
+    refresh_task = instance_registry["refresh_task"]
+    updated = instance_registry["updated"]
+
+    if updated is None:
+        if not refresh_task:
+            refresh_task = discord_client.loop.create_task(
+                refresh_instance_registry(discord_client=discord_client)
+            )
+            instance_registry["refresh_task"] = refresh_task
+
+        return await asyncio.shield(refresh_task)
+
+    # Serve the cached list while a stale registry refreshes in the background.
+    if time.monotonic() - updated > INSTANCE_REGISTRY_TTL and not refresh_task:
+        instance_registry["refresh_task"] = discord_client.loop.create_task(
+            refresh_instance_registry(discord_client=discord_client)
+        )
+
+    return instance_registry["instances"]
+
+
+async def get_instances(discord_client, selector=None):
+    instances_list = await get_instance_registry(discord_client=discord_client)
+
+    # A selector matches either an instance name or a zone.
+    instances = [
+        {"zone": instance["zone"], "instance_name": instance["instance_name"]}
+        for instance in instances_list
+        if selector is None or selector in (instance["instance_name"], instance["zone"])
     ]
 
-    zone = instances_list[0]["zone"]
-    instance_name = instances_list[0]["instance_name"]
-    instance = {"zone": zone, "instance_name": instance_name}
+    return instances
+
+
+async def get_instance(discord_client, selector=None):
+    instances = await get_instances(discord_client=discord_client, selector=selector)
+    if not instances:
+        return
 
+    instance = instances[0]
     return instance
 
 
@@ -116,7 +296,7 @@ async def start(discord_client, instance):
         discord_client=discord_client, instance=instance
     )
 
-    if instance_attributes["instance_status"] == compute_v1.Instance.Status.RUNNING.name:
+    if instance_attributes["instance_status"] == "RUNNING":
         message = {
             "message": f"`{instance["instance_name"]}` in `{instance["zone"]}` is already `{instance_attributes["instance_status"] }`.",
             "log_message": f"locked: {instance_attributes["instance_status"] }",
@@ -125,22 +305,29 @@ async def start(discord_client, instance):
         return message
 
     elif instance_attributes["instance_status"]  in [
-        compute_v1.Instance.Status.STOPPED.name,
-        compute_v1.Instance.Status.TERMINATED.name,
+        "STOPPED",
+        "TERMINATED",
     ]:
-        operation = compute_client.start(
-            project=GOOGLE_CLOUD_PROJECT, zone=instance["zone"], instance=instance["instance_name"]
-        )
+        with metrics.measure_stage("gce_operation", operation="start"):
+            operation = await gcp_clients.run_blocking(
+                func=lambda: gcp_clients.compute_client.start(
+                    project=GOOGLE_CLOUD_PROJECT,
+                    zone=instance["zone"],
+                    instance=instance["instance_name"],
+                ),
+            )
 
-        message = await operation_result(discord_client=discord_client, operation_name=operation.name, instance=instance)
+            message = await operation_result(discord_client=discord_client, operation_name=operation.name, instance=instance)
 
         if message.get("status") == "success":
             server_startup_in_progress.add(instance["instance_name"])
-            instance_attributes = await health_check(discord_client=discord_client, instance=instance)
-            
+            instance_attributes = await health_check(
+                discord_client=discord_client, instance=instance, max_staleness=0
+            )
+
             try:
                 commands = ["./start", "./get_start_timestamp"]
-                await instance_ssh.remote_exec(discord_client=discord_client, instance_ip=instance_attributes["instance_ip"], commands=commands)
+                await instance_ssh.remote_exec(discord_client=discord_client, instance_ip=instance_attributes["instance_ip"], commands=commands, instance_name=instance["instance_name"])
 
             except Exception as e:
                 server_startup_in_progress.remove(instance["instance_name"])
@@ -188,8 +375,8 @@ async def stop(discord_client, instance):
         return message
 
     if instance_attributes["instance_status"]  in [
-        compute_v1.Instance.Status.STOPPED.name,
-        compute_v1.Instance.Status.TERMINATED.name,
+        "STOPPED",
+        "TERMINATED",
     ]:
         
         message = {
@@ -199,7 +386,7 @@ async def stop(discord_client, instance):
 
         return message
 
-    elif instance_attributes["instance_status"] == compute_v1.Instance.Status.RUNNING.name:
+    elif instance_attributes["instance_status"] == "RUNNING":
         server_shutdown_in_progress.add(instance["instance_name"])
         session_manager.session_running.discard(instance["instance_name"])
 
@@ -220,11 +407,19 @@ async def stop(discord_client, instance):
         finally:
             server_shutdown_in_progress.discard(instance["instance_name"])
 
-        operation = compute_client.stop(
-            project=GOOGLE_CLOUD_PROJECT, zone=instance["zone"], instance=instance["instance_name"]
-        )
+        await instance_ssh.close_connection(instance_ip=instance_attributes["instance_ip"])
+        await discard_console_log_locks(instance_name=instance["instance_name"])
+
+        with metrics.measure_stage("gce_operation", operation="stop"):
+            operation = await gcp_clients.run_blocking(
+                func=lambda: gcp_clients.compute_client.stop(
+                    project=GOOGLE_CLOUD_PROJECT,
+                    zone=instance["zone"],
+                    instance=instance["instance_name"],
+                ),
+            )
 
-        message = await operation_result(discord_client=discord_client, operation_name=operation.name, instance=instance)
+            message = await operation_result(discord_client=discord_client, operation_name=operation.name, instance=instance)
 
         return message
 
@@ -237,25 +432,67 @@ async def stop(discord_client, instance):
         return message
 
 
-async def read_console_log(discord_client, instance):
-    zone = instance["zone"]
+async def read_console_log(discord_client, instance, session_key=None):
     instance_name = instance["instance_name"]
-    instance_info = await discord_client.loop.run_in_executor(
-        executor=None,
-        func=lambda: compute_client.get(
-            project=GOOGLE_CLOUD_PROJECT, zone=zone, instance=instance_name
-        ),
+    instance_info = await get_instance_info(
+        discord_client=discord_client, instance=instance
+    )
+
+    # The parser only advances its offset after a successful parse, so the next read resumes from there.
+    log_offset = (
+        await console_log_parser.get_parsed_offset(session_key) if session_key else 0
     )
 
+    command = "./read_console_log"
+    if log_offset:
+        command = f"{command} | tail -c +{log_offset + 1}"
+
+    if CONSOLE_LOG_COMPRESSION == "gzip":
+        command = f"{command} | gzip -c"
+
+    # Without pipefail the exit status is gzip's or tail's, and a failing read would look like an empty log.
+    if command != "./read_console_log":
+        command = f"bash -o pipefail -c {shlex.quote(command)}"
+
     instance_ip = instance_info.network_interfaces[0].access_configs[0].nat_i_p
     console_log = await instance_ssh.remote_exec(
         discord_client=discord_client,
         instance_ip=instance_ip,
-        commands=["./read_console_log"],
+        commands=[command],
     )
 
+    # remote_exec returns None when the command exited non-zero; an empty read is b"".
+    if console_log is None:
+        raise RuntimeError(
+            f"Unable to read console log from {instance_name} at offset {log_offset}."
+        )
+
+    if console_log and CONSOLE_LOG_COMPRESSION == "gzip":
+        console_log = await discord_client.loop.run_in_executor(
+            executor=None, func=lambda: gzip.decompress(console_log)
+        )
+
+    if session_key:
+        logger.info(
+            f"Fetched {len(console_log)} console log byte(s) from offset {log_offset}."
+        )
+
     console_log_file = await discord_client.loop.run_in_executor(
-        executor=None, func=lambda: StringIO(console_log)
+        executor=None, func=lambda: StringIO(console_log.decode("utf-8"))
+    )
+
+    console_log_read = {"console_log_file": console_log_file, "log_offset": log_offset}
+    return console_log_read
+
+
+async def get_console_log_lock(instance, session_key):
+    console_log_lock = console_log_locks.setdefault(
+        session_key or (instance["instance_name"], None), asyncio.Lock()
     )
 
-    return console_log_file
+    return console_log_lock
+
+
+async def discard_console_log_locks(instance_name):
+    for lock_key in [key for key in console_log_locks if key[0] == instance_name]:
+        del console_log_locks[lock_key]
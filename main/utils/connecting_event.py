@@ -1,17 +1,42 @@
 import logging
-from utils import message_formatting, console_log_parser, cloud_logging, log_enrichment
+
+from datetime import timedelta
+from utils import (
+    message_formatting,
+    console_log_parser,
+    cloud_logging,
+    log_enrichment,
+    event_store,
+)
 
 logger = logging.getLogger(__name__)
 
 
 async def construct_event_log(
-    discord_client, argument, instance, console_log_file, server_start_date, flag=None
+    discord_client,
+    argument,
+    instance,
+    console_log_file,
+    server_start_date,
+    flag=None,
+    session_key=None,
+    log_offset=0,
+    alert_started=None,
 ):
 
-    console_log_data = await console_log_parser.parse_log(
-        log_file=console_log_file,
-        start_date=server_start_date,
-    )
+    # Archived logs are streamed from cloud storage; only live logs resume from the session's parser state.
+    if flag == "archive":
+        console_log_data = await console_log_parser.parse_stream(
+            line_batches=console_log_file, start_date=server_start_date
+        )
+
+    else:
+        console_log_data = await console_log_parser.parse_log(
+            log_file=console_log_file,
+            start_date=server_start_date,
+            session_key=session_key,
+            log_offset=log_offset,
+        )
 
     if len(console_log_data) == 0:
         message = "No player connected."
@@ -25,33 +50,124 @@ async def construct_event_log(
         logger.info(logger_info_message)
         return message
 
+    report_log_data = console_log_data
     if flag == "webhook":
-        console_log_data = [console_log_data[-1]]
+        # Webhooks report every connection not yet announced; without a session only the latest one is known.
+        if session_key:
+            notified_keys = await event_store.load_notified(session_key)
+
+            # On the first alert of a session, connections older than the earliest alert are seeded as notified.
+            if not notified_keys and alert_started:
+                seeded_log_data = [
+                    event
+                    for event in console_log_data
+                    if event["Timestamp"] < alert_started - timedelta(seconds=1)
+                ]
+
+                await event_store.mark_notified(
+                    session_key=session_key, events=seeded_log_data
+                )
+                notified_keys = {
+                    await event_store.event_key(event) for event in seeded_log_data
+                }
+
+            report_log_data = [
+                event
+                for event in console_log_data
+                if await event_store.event_key(event) not in notified_keys
+            ]
+
+        else:
+            report_log_data = [console_log_data[-1]]
+
+        if len(report_log_data) == 0:
+            message = "No new player connected."
+            logger_info_message = (
+                await message_formatting.create_logger_info_message(
+                    command=argument,
+                    message=message,
+                    instance_name=instance["instance_name"],
+                    zone=instance["zone"],
+                )
+            )
 
-    message = "Fetching IP address from cloud logging..."
-    logger_info_message = await message_formatting.create_logger_info_message(
-        command=argument,
-        message=message,
-        instance_name=instance["instance_name"],
-        zone=instance["zone"],
-    )
+            logger.info(logger_info_message)
+            return message
 
-    logger.info(logger_info_message)
+    stored_events = {}
+    if session_key:
+        stored_events = await event_store.load_events(session_key)
+        parsed_log_data = [
+            event
+            for event in console_log_data
+            if await event_store.event_key(event) not in stored_events
+        ]
+
+        await event_store.store_events(
+            session_key=session_key, events=parsed_log_data, stage="parsed"
+        )
+
+    pending_log_data = [
+        event
+        for event in report_log_data
+        if stored_events.get(await event_store.event_key(event), {}).get("stage")
+        != "enriched"
+    ]
+
+    if pending_log_data:
+        message = f"Fetching IP address from cloud logging for {len(pending_log_data)} event(s)..."
+        logger_info_message = await message_formatting.create_logger_info_message(
+            command=argument,
+            message=message,
+            instance_name=instance["instance_name"],
+            zone=instance["zone"],
+        )
+
+        logger.info(logger_info_message)
+
+        await cloud_logging.create_ip_log_data(
+            discord_client=discord_client,
+            console_log_data=console_log_data,
+            time_range_data=pending_log_data,
+        )
+
+        if session_key:
+            await event_store.store_events(
+                session_key=session_key,
+                events=[event for event in pending_log_data if event.get("IP Address")],
+                stage="matched",
+            )
+
+        message = "Enriching log data..."
+        logger_info_message = await message_formatting.create_logger_info_message(
+            command=argument,
+            message=message,
+            instance_name=instance["instance_name"],
+            zone=instance["zone"],
+        )
+
+        logger.info(logger_info_message)
 
-    ip_log_data = await cloud_logging.create_ip_log_data(
-        discord_client=discord_client, console_log_data=console_log_data
-    )
+        await log_enrichment.enrich_data(pending_log_data)
 
-    message = "Enriching log data..."
-    logger_info_message = await message_formatting.create_logger_info_message(
-        command=argument,
-        message=message,
-        instance_name=instance["instance_name"],
-        zone=instance["zone"],
-    )
+        if session_key:
+            await event_store.store_events(
+                session_key=session_key,
+                events=[
+                    event
+                    for event in pending_log_data
+                    if "Country" in event and "VPN" in event
+                ],
+                stage="enriched",
+            )
 
-    logger.info(logger_info_message)
+    # Events already enriched in an earlier run are served from the store.
+    enriched_log_data = []
+    for event in report_log_data:
+        stored_event = stored_events.get(await event_store.event_key(event), {})
+        if stored_event.get("stage") == "enriched":
+            event = stored_event["event"]
 
-    enriched_log_data = await log_enrichment.enrich_data(ip_log_data)
+        enriched_log_data.append(event)
 
     return enriched_log_data
@@ -1,47 +1,100 @@
 import re
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, time, timedelta, timezone
 import logging
 
+from utils import metrics
+
 logger = logging.getLogger(__name__)
 
 time_pattern = re.compile(r"(\s*\d{1,2}:\d{2}:\d{2}),?")
 player_connecting_pattern = re.compile(r"Player\s+(.*?)\s+connecting")
 player_connected_pattern = re.compile(r"Player\s+.*?\s+connected\s+\(id=(.*?)\)\.")
 
+parser_states = {}
+decoded_times = {}
+
+
+def decode_time(time_str):
+    # Hot path: called for every timestamped line, so avoid strptime and memoize per second value.
+    seconds = decoded_times.get(time_str)
+    if seconds is None:
+        hours, minutes, secs = time_str.split(":")
+        hours, minutes, secs = int(hours), int(minutes), int(secs)
+        if hours > 23 or minutes > 59 or secs > 59:
+            raise ValueError(f"time data {time_str!r} does not match format '%H:%M:%S'")
+
+        seconds = hours * 3600 + minutes * 60 + secs
+        decoded_times[time_str] = seconds
+
+    return seconds
+
 
 async def convert_to_datetime(time_str, start_date, microseconds=0):
-    time_obj = datetime.strptime(time_str, "%H:%M:%S").time()
+    hours, seconds = divmod(decode_time(time_str), 3600)
+    minutes, seconds = divmod(seconds, 60)
+    time_obj = time(hours, minutes, seconds, microseconds)
+
+    return datetime.combine(start_date, time_obj, tzinfo=timezone.utc)
+
 
-    return datetime.combine(start_date, time_obj).replace(
-        microsecond=microseconds, tzinfo=timezone.utc
-    )
+async def create_parser_state(start_date):
+    parser_state = {
+        "offset": 0,
+        "previous_time": None,
+        "start_date": start_date,
+        "connecting_players": {},
+        "console_log_data": [],
+    }
 
+    return parser_state
 
-async def parse_log(log_file, start_date):
-    connecting_players = {}
-    console_log_data = []
 
-    first_line = log_file.readline()
-    first_time_match = time_pattern.match(first_line)
-    if first_time_match:
-        first_time_str = first_time_match.group(1).strip()
-        content_start_pos = first_time_match.end()
-        content = first_line[content_start_pos:].strip()
-        previous_time = datetime.strptime(first_time_str, "%H:%M:%S").time()
+async def get_parsed_offset(session_key):
+    parser_state = parser_states.get(session_key)
+    parsed_offset = parser_state["offset"] if parser_state else 0
 
-    else:
-        previous_time = datetime.min.time()
-        content = first_line.strip()
+    return parsed_offset
 
-    log_file.seek(0)
+
+async def discard_parser_state(session_key):
+    parser_states.pop(session_key, None)
+
+
+async def skip_parsed_lines(log_file, parser_state, log_offset):
+    position = log_offset
+    while position < parser_state["offset"]:
+        line = log_file.readline()
+        if not line:
+            return False
+
+        position += len(line.encode("utf-8"))
+
+    return position == parser_state["offset"]
+
+
+async def parse_lines(log_file, parser_state, final=False):
+    connecting_players = parser_state["connecting_players"]
+    console_log_data = parser_state["console_log_data"]
+    previous_time = parser_state["previous_time"]
+    start_date = parser_state["start_date"]
+    offset = parser_state["offset"]
 
     for line in log_file:
+        # A trailing line without a newline may still be written to; leave it for the next call.
+        if not final and not line.endswith("\n"):
+            break
+
+        offset += len(line.encode("utf-8"))
+
         time_match = time_pattern.match(line)
         if time_match:
             time_str = time_match.group(1).strip()
             content_start_pos = time_match.end()
             content = line[content_start_pos:].strip()
-            current_time = datetime.strptime(time_str, "%H:%M:%S").time()
+            current_time = decode_time(time_str)
+            if previous_time is None:
+                previous_time = current_time
+
             if current_time < previous_time:
                 start_date += timedelta(days=1)
 
@@ -49,6 +102,8 @@ async def parse_log(log_file, start_date):
         else:
             time_str = ""
             content = line.strip()
+            if previous_time is None:
+                previous_time = 0
 
         player_connecting_match = player_connecting_pattern.search(content)
         if player_connecting_match:
@@ -57,26 +112,75 @@ async def parse_log(log_file, start_date):
             continue
 
         player_connected_match = player_connected_pattern.search(content)
-        if player_connected_match:
+        if player_connected_match and connecting_players:
             steam_id = player_connected_match.group(1)
-            for player_name, connect_time_str in connecting_players.items():
-                steam_link = f"https://steamcommunity.com/profiles/{steam_id}"
-                connect_datetime_obj = await convert_to_datetime(
-                    connect_time_str, start_date
-                )
-
-                console_log_data.append(
-                    {
-                        "Timestamp": connect_datetime_obj,
-                        "Time": connect_time_str,
-                        "Content": content,
-                        "Player": player_name,
-                        "Steam ID": steam_id,
-                        "Steam Link": steam_link,
-                    }
-                )
-                break
+            player_name, connect_time_str = next(iter(connecting_players.items()))
+            steam_link = f"https://steamcommunity.com/profiles/{steam_id}"
+            connect_datetime_obj = await convert_to_datetime(
+                connect_time_str, start_date
+            )
+
+            console_log_data.append(
+                {
+                    "Timestamp": connect_datetime_obj,
+                    "Time": connect_time_str,
+                    "Content": content,
+                    "Player": player_name,
+                    "Steam ID": steam_id,
+                    "Steam Link": steam_link,
+                }
+            )
 
             connecting_players.pop(player_name, None)
 
+    parser_state["previous_time"] = previous_time
+    parser_state["start_date"] = start_date
+    parser_state["offset"] = offset
+
+
+async def parse_stream(line_batches, start_date):
+    parser_state = await create_parser_state(start_date)
+
+    # Batches hold whole lines, so each one can be parsed as soon as it arrives.
+    async for lines in line_batches:
+        with metrics.measure_stage("console_parse", source="archive"):
+            await parse_lines(log_file=lines, parser_state=parser_state, final=True)
+
+    return parser_state["console_log_data"]
+
+
+async def parse_log(log_file, start_date, session_key=None, log_offset=0):
+    if session_key is None:
+        parser_state = await create_parser_state(start_date)
+        with metrics.measure_stage("console_parse", source="live"):
+            await parse_lines(log_file=log_file, parser_state=parser_state, final=True)
+
+        return parser_state["console_log_data"]
+
+    parser_state = parser_states.get(session_key)
+    parsed_offset = parser_state["offset"] if parser_state else 0
+
+    # Never skip ahead: events before the gap would be lost. Dropping the state makes the next read fetch the whole log.
+    if log_offset > parsed_offset:
+        await discard_parser_state(session_key)
+        raise ValueError(
+            f"Console log offset {log_offset} is ahead of parsed offset {parsed_offset} for session {session_key}. Re-fetching from start."
+        )
+
+    if not parser_state:
+        parser_state = await create_parser_state(start_date)
+        parser_states[session_key] = parser_state
+
+    elif not await skip_parsed_lines(
+        log_file=log_file, parser_state=parser_state, log_offset=log_offset
+    ):
+        await discard_parser_state(session_key)
+        raise ValueError(
+            f"Console log is shorter than parsed offset {parsed_offset} for session {session_key}. Re-fetching from start."
+        )
+
+    with metrics.measure_stage("console_parse", source="live"):
+        await parse_lines(log_file=log_file, parser_state=parser_state)
+
+    console_log_data = [dict(event) for event in parser_state["console_log_data"]]
     return console_log_data
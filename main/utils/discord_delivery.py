@@ -0,0 +1,135 @@
+import logging
+import asyncio
+import time
+
+from settings import CHANNEL_QUEUE_SIZE, CHANNEL_DROP_POLICY
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+channel_queues = {}
+
+# Discord accepts up to 10 embeds per message, with at most 6000 characters across them.
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARACTERS_PER_MESSAGE = 6000
+
+
+async def pack_embeds(embeds):
+    embed_batches = []
+    embed_batch = []
+    batch_characters = 0
+
+    for embed in embeds:
+        embed_characters = len(embed)
+        if embed_batch and (
+            len(embed_batch) == MAX_EMBEDS_PER_MESSAGE
+            or batch_characters + embed_characters > MAX_EMBED_CHARACTERS_PER_MESSAGE
+        ):
+            embed_batches.append(embed_batch)
+            embed_batch = []
+            batch_characters = 0
+
+        embed_batch.append(embed)
+        batch_characters += embed_characters
+
+    if embed_batch:
+        embed_batches.append(embed_batch)
+
+    return embed_batches
+
+
+async def send_embeds(destination, embeds, content=None):
+    start_time = time.monotonic()
+    embed_batches = await pack_embeds(embeds)
+
+    if content and not embed_batches:
+        with metrics.measure_stage("discord_send"):
+            await destination.send(content=content)
+
+    # discord.py waits on the per-route rate limit buckets reported by the API for each send.
+    for embed_batch in embed_batches:
+        with metrics.measure_stage("discord_send"):
+            await destination.send(content=content, embeds=embed_batch)
+
+        content = None
+
+    elapsed_time = time.monotonic() - start_time
+    delivery_report = {
+        "embeds": len(embeds),
+        "messages": len(embed_batches),
+        "elapsed_time": elapsed_time,
+        "embeds_per_second": len(embeds) / elapsed_time if elapsed_time else 0,
+    }
+
+    logger.info(
+        f"Delivered {delivery_report['embeds']} embed(s) in {delivery_report['messages']} message(s) "
+        f"over {elapsed_time:.2f}s ({delivery_report['embeds_per_second']:.1f} embed(s)/s)."
+    )
+
+    return delivery_report
+
+
+async def channel_worker(channel, channel_queue):
+    while True:
+        delivery = await channel_queue["queue"].get()
+        try:
+            await send_embeds(
+                destination=channel,
+                embeds=delivery["embeds"],
+                content=delivery["content"],
+            )
+
+        except Exception as e:
+            logger.error(f"Error delivering to channel {channel.id}: {e}")
+
+        finally:
+            channel_queue["queue"].task_done()
+
+
+async def get_channel_queue(channel):
+    channel_queue = channel_queues.get(channel.id)
+    if not channel_queue:
+        channel_queue = {
+            "queue": asyncio.Queue(maxsize=CHANNEL_QUEUE_SIZE),
+            "dropped": 0,
+        }
+        channel_queue["worker"] = asyncio.get_running_loop().create_task(
+            channel_worker(channel=channel, channel_queue=channel_queue)
+        )
+        channel_queues[channel.id] = channel_queue
+
+    return channel_queue
+
+
+async def enqueue_delivery(channel, embeds=None, content=None):
+    channel_queue = await get_channel_queue(channel)
+    delivery = {"embeds": embeds or [], "content": content}
+
+    # A full queue means the channel is slow or rate limited; shed load there without stalling other channels.
+    if channel_queue["queue"].full():
+        channel_queue["dropped"] += 1
+        if CHANNEL_DROP_POLICY == "drop-newest":
+            logger.warning(
+                f"Delivery queue for channel {channel.id} is full. Dropped newest delivery ({channel_queue['dropped']} total)."
+            )
+
+            return False
+
+        channel_queue["queue"].get_nowait()
+        channel_queue["queue"].task_done()
+        logger.warning(
+            f"Delivery queue for channel {channel.id} is full. Dropped oldest delivery ({channel_queue['dropped']} total)."
+        )
+
+    channel_queue["queue"].put_nowait(delivery)
+
+    return True
+
+
+async def broadcast(channels, embeds=None, content=None):
+    queued = [
+        await enqueue_delivery(channel=channel, embeds=embeds, content=content)
+        for channel in channels
+        if channel
+    ]
+
+    return sum(queued)
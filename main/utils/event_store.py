@@ -0,0 +1,176 @@
+import logging
+import asyncio
+import json
+import sqlite3
+
+from datetime import datetime
+from settings import EVENT_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+event_store_schema = [
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        instance TEXT NOT NULL,
+        session TEXT NOT NULL,
+        steam_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        player TEXT,
+        ip_address TEXT,
+        stage TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (instance, session, steam_id, timestamp)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS events_session_player ON events (instance, session, player)",
+    "CREATE INDEX IF NOT EXISTS events_steam_id ON events (steam_id)",
+    "CREATE INDEX IF NOT EXISTS events_ip_address ON events (ip_address)",
+    """
+    CREATE TABLE IF NOT EXISTS notifications (
+        instance TEXT NOT NULL,
+        session TEXT NOT NULL,
+        steam_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        PRIMARY KEY (instance, session, steam_id, timestamp)
+    )
+    """,
+]
+event_store_ready = False
+
+
+def connect():
+    global event_store_ready
+    connection = sqlite3.connect(EVENT_STORE_PATH)
+    if not event_store_ready:
+        for statement in event_store_schema:
+            connection.execute(statement)
+
+        connection.commit()
+        event_store_ready = True
+
+    return connection
+
+
+async def event_key(event):
+    return (event["Steam ID"], event["Timestamp"].isoformat())
+
+
+async def serialize_event(event):
+    data = dict(event, Timestamp=event["Timestamp"].isoformat())
+    return json.dumps(data)
+
+
+async def deserialize_event(data):
+    event = json.loads(data)
+    event["Timestamp"] = datetime.fromisoformat(event["Timestamp"])
+    return event
+
+
+async def store_events(session_key, events, stage):
+    # session_key is (instance_name, server_start_timestamp); fleet instances can start in the same second.
+    instance_name, server_start_timestamp = session_key
+    rows = [
+        (
+            instance_name,
+            server_start_timestamp,
+            event["Steam ID"],
+            event["Timestamp"].isoformat(),
+            event["Player"],
+            event.get("IP Address"),
+            stage,
+            await serialize_event(event),
+        )
+        for event in events
+    ]
+
+    def write_rows():
+        connection = connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO events "
+                    "(instance, session, steam_id, timestamp, player, ip_address, stage, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+        finally:
+            connection.close()
+
+    if rows:
+        await asyncio.get_running_loop().run_in_executor(executor=None, func=write_rows)
+
+
+async def load_events(session_key):
+    def read_rows():
+        connection = connect()
+        try:
+            return connection.execute(
+                "SELECT stage, data FROM events "
+                "WHERE instance = ? AND session = ? ORDER BY timestamp",
+                session_key,
+            ).fetchall()
+
+        finally:
+            connection.close()
+
+    rows = await asyncio.get_running_loop().run_in_executor(
+        executor=None, func=read_rows
+    )
+
+    stored_events = {}
+    for stage, data in rows:
+        event = await deserialize_event(data)
+        stored_events[await event_key(event)] = {"stage": stage, "event": event}
+
+    return stored_events
+
+
+async def mark_notified(session_key, events):
+    instance_name, server_start_timestamp = session_key
+    rows = [
+        (
+            instance_name,
+            server_start_timestamp,
+            event["Steam ID"],
+            event["Timestamp"].isoformat(),
+        )
+        for event in events
+    ]
+
+    def write_rows():
+        connection = connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO notifications "
+                    "(instance, session, steam_id, timestamp) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+
+        finally:
+            connection.close()
+
+    if rows:
+        await asyncio.get_running_loop().run_in_executor(executor=None, func=write_rows)
+
+
+async def load_notified(session_key):
+    def read_rows():
+        connection = connect()
+        try:
+            return connection.execute(
+                "SELECT steam_id, timestamp FROM notifications "
+                "WHERE instance = ? AND session = ?",
+                session_key,
+            ).fetchall()
+
+        finally:
+            connection.close()
+
+    rows = await asyncio.get_running_loop().run_in_executor(
+        executor=None, func=read_rows
+    )
+
+    notified_keys = {(steam_id, timestamp) for steam_id, timestamp in rows}
+    return notified_keys
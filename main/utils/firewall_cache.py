@@ -0,0 +1,118 @@
+import logging
+
+from datetime import datetime, timedelta, timezone
+from settings import FIREWALL_CACHE_SETTLE_SECONDS, FIREWALL_CACHE_RETENTION
+
+logger = logging.getLogger(__name__)
+
+# Connection records bucketed by minute, and the whole-second time ranges already fetched from Cloud Logging.
+firewall_buckets = {}
+covered_ranges = []
+
+
+async def bucket_key(timestamp):
+    return timestamp.replace(second=0, microsecond=0)
+
+
+async def plan_time_ranges(min_time, max_time):
+    time_ranges = []
+    cursor = min_time
+
+    for covered_min_time, covered_max_time in covered_ranges:
+        if covered_max_time < cursor:
+            continue
+
+        if covered_min_time > max_time:
+            break
+
+        if covered_min_time > cursor:
+            time_ranges.append(
+                {
+                    "min_time": cursor,
+                    "max_time": covered_min_time - timedelta(seconds=1),
+                    "covered": False,
+                }
+            )
+
+        time_ranges.append(
+            {
+                "min_time": max(covered_min_time, cursor),
+                "max_time": min(covered_max_time, max_time),
+                "covered": True,
+            }
+        )
+
+        cursor = covered_max_time + timedelta(seconds=1)
+        if cursor > max_time:
+            break
+
+    if cursor <= max_time:
+        time_ranges.append({"min_time": cursor, "max_time": max_time, "covered": False})
+
+    return time_ranges
+
+
+async def add_records(connection_attributes):
+    for connection in connection_attributes:
+        key = await bucket_key(connection["timestamp"])
+        firewall_bucket = firewall_buckets.setdefault(key, [])
+        if connection not in firewall_bucket:
+            firewall_bucket.append(connection)
+
+
+async def get_records(min_time, max_time):
+    connection_attributes = []
+    key = await bucket_key(min_time)
+
+    while key <= max_time:
+        connection_attributes.extend(
+            connection
+            for connection in firewall_buckets.get(key, [])
+            if min_time <= connection["timestamp"] <= max_time
+        )
+        key += timedelta(minutes=1)
+
+    connection_attributes.sort(key=lambda connection: connection["timestamp"])
+    return connection_attributes
+
+
+async def mark_covered(min_time, max_time):
+    # Recent entries may not be ingested yet, so only the settled part of a range counts as covered.
+    settled_time = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(
+        seconds=FIREWALL_CACHE_SETTLE_SECONDS
+    )
+    max_time = min(max_time, settled_time)
+    if max_time < min_time:
+        return
+
+    merged_ranges = []
+    for covered_min_time, covered_max_time in sorted(
+        covered_ranges + [(min_time, max_time)]
+    ):
+        if merged_ranges and covered_min_time <= merged_ranges[-1][1] + timedelta(
+            seconds=1
+        ):
+            merged_ranges[-1] = (
+                merged_ranges[-1][0],
+                max(merged_ranges[-1][1], covered_max_time),
+            )
+
+        else:
+            merged_ranges.append((covered_min_time, covered_max_time))
+
+    covered_ranges[:] = merged_ranges
+
+
+async def prune_records():
+    retention_time = datetime.now(timezone.utc) - timedelta(
+        seconds=FIREWALL_CACHE_RETENTION
+    )
+
+    for key in [key for key in firewall_buckets if key < retention_time]:
+        del firewall_buckets[key]
+
+    covered_ranges[:] = [
+        (max(covered_min_time, retention_time.replace(microsecond=0)), covered_max_time)
+        for covered_min_time, covered_max_time in covered_ranges
+        if covered_max_time >= retention_time
+    ]
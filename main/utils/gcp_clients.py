@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import settings
+
+from concurrent.futures import ThreadPoolExecutor
+from settings import GCP_EXECUTOR_WORKERS
+
+# google-cloud-compute and google-cloud-storage only ship blocking clients, so their calls run on a dedicated pool.
+gcp_executor = ThreadPoolExecutor(
+    max_workers=GCP_EXECUTOR_WORKERS, thread_name_prefix="gcp"
+)
+gcp_client_lock = threading.Lock()
+logging_client = None
+
+
+def create_compute_client():
+    from google.cloud import compute_v1
+
+    return compute_v1.InstancesClient(credentials=settings.GOOGLE_COMPUTE_ENGINE)
+
+
+def create_operation_client():
+    from google.cloud import compute_v1
+
+    return compute_v1.ZoneOperationsClient(credentials=settings.GOOGLE_COMPUTE_ENGINE)
+
+
+def create_storage_client():
+    from google.cloud import storage
+
+    return storage.Client(credentials=settings.GOOGLE_CLOUD_STORAGE)
+
+
+gcp_client_factories = {
+    "compute_client": create_compute_client,
+    "operation_client": create_operation_client,
+    "storage_client": create_storage_client,
+}
+
+
+def __getattr__(name):
+    # Clients are built on first use, usually inside an executor call, so the Google libraries stay off the startup path.
+    if name not in gcp_client_factories:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with gcp_client_lock:
+        if name not in globals():
+            globals()[name] = gcp_client_factories[name]()
+
+    return globals()[name]
+
+
+async def run_blocking(func):
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(executor=gcp_executor, func=func)
+
+    return result
+
+
+async def get_logging_client():
+    from google.cloud.logging_v2.services.logging_service_v2 import (
+        LoggingServiceV2AsyncClient,
+    )
+
+    global logging_client
+    if logging_client is None:
+        logging_client = LoggingServiceV2AsyncClient(
+            credentials=settings.GOOGLE_CLOUD_LOGGING
+        )
+
+    return logging_client
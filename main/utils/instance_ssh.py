@@ -1,15 +1,21 @@
 import logging
 import asyncio
-import paramiko
+import settings
 
-from settings import SSH_KEY
 from bot_commands import session_manager
-from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
 
 logger = logging.getLogger(__name__)
 
+SSH_KEEPALIVE_INTERVAL = 30
+READ_ONLY_COMMANDS = ("./read_console_log", "./get_start_timestamp")
+ssh_connections = {}
+ssh_connection_locks = {}
+
 
 async def exponential_backoff_connect(discord_client, ssh_client, instance_ip):
+    import paramiko
+
     MAX_RETRIES = 10
     INITIAL_DELAY = 1
     MAX_DELAY = 16
@@ -19,10 +25,13 @@ async def exponential_backoff_connect(discord_client, ssh_client, instance_ip):
     logger.info(f"Attempting to connect to {instance_ip}")
     while attempt < MAX_RETRIES:
         try:
-            await discord_client.loop.run_in_executor(
-                executor=None,
-                func=lambda: ssh_client.connect(hostname=instance_ip, pkey=SSH_KEY),
-            )
+            with metrics.measure_stage("ssh_connect"):
+                await discord_client.loop.run_in_executor(
+                    executor=None,
+                    func=lambda: ssh_client.connect(
+                        hostname=instance_ip, pkey=settings.SSH_KEY
+                    ),
+                )
 
             return
 
@@ -45,61 +54,128 @@ async def exponential_backoff_connect(discord_client, ssh_client, instance_ip):
     raise Exception("Unable to establish SSH connection after maximum retries.")
 
 
-async def remote_exec(discord_client, instance_ip, commands):
-    console_log = None
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-    try:
-        await exponential_backoff_connect(
-            discord_client=discord_client,
-            ssh_client=ssh_client,
-            instance_ip=instance_ip,
-        )
+async def connection_alive(ssh_client):
+    transport = ssh_client.get_transport()
+    return transport is not None and transport.is_active()
+
+
+async def get_connection(discord_client, instance_ip):
+    connection_lock = ssh_connection_locks.setdefault(instance_ip, asyncio.Lock())
+    async with connection_lock:
+        ssh_client = ssh_connections.get(instance_ip)
+        if ssh_client and await connection_alive(ssh_client):
+            return ssh_client
+
+        if ssh_client:
+            logger.warning(f"SSH connection to {instance_ip} is dead. Reconnecting.")
+            ssh_client.close()
+            del ssh_connections[instance_ip]
+
+        # paramiko and cryptography are imported on first connection to keep them off the startup path.
+        import paramiko
+
+        ssh_client = paramiko.SSHClient()
+        ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+        try:
+            await exponential_backoff_connect(
+                discord_client=discord_client,
+                ssh_client=ssh_client,
+                instance_ip=instance_ip,
+            )
+
+        except Exception as e:
+            logger.error(
+                f"Unable to establish SSH connection to {instance_ip} after maximum retries: {e}"
+            )
+
+            raise e
+
+        ssh_client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        ssh_connections[instance_ip] = ssh_client
+
+        return ssh_client
+
+
+async def close_connection(instance_ip):
+    ssh_client = ssh_connections.pop(instance_ip, None)
+    ssh_connection_locks.pop(instance_ip, None)
+    if ssh_client:
+        ssh_client.close()
+        logger.info(f"Closed SSH connection to {instance_ip}")
 
-    except Exception as e:
-        logger.error(
-            f"Unable to establish SSH connection to {instance_ip} after maximum retries: {e}"
+
+async def exec_command(discord_client, ssh_client, command):
+    def run_command():
+        stdin, stdout, stderr = ssh_client.exec_command(command)
+        output = stdout.read()
+        error = stderr.read()
+        exit_status = stdout.channel.recv_exit_status()
+
+        return exit_status, output, error
+
+    with metrics.measure_stage("ssh_exec"):
+        command_result = await discord_client.loop.run_in_executor(
+            executor=None, func=run_command
         )
 
-        raise e
+    return command_result
+
+
+async def remote_exec(discord_client, instance_ip, commands, instance_name=None):
+    import paramiko
+
+    console_log = None
+    ssh_client = await get_connection(
+        discord_client=discord_client, instance_ip=instance_ip
+    )
 
-    ssh_command_executor = ThreadPoolExecutor(max_workers=len(commands))
     for command in commands:
-        stdin, stdout, stderr = await discord_client.loop.run_in_executor(
-            executor=ssh_command_executor, func=lambda: ssh_client.exec_command(command)
-        )
+        try:
+            exit_status, output, error = await exec_command(
+                discord_client=discord_client, ssh_client=ssh_client, command=command
+            )
 
-        exit_status = await discord_client.loop.run_in_executor(
-            executor=ssh_command_executor,
-            func=lambda: stdout.channel.recv_exit_status(),
-        )
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            await close_connection(instance_ip)
 
-        if exit_status == 0:
-            output = await discord_client.loop.run_in_executor(
-                executor=ssh_command_executor,
-                func=lambda: stdout.read().decode("utf-8").strip(),
+            # ./start and ./stop may already have run before the transport dropped, so only reads are retried.
+            if not any(
+                read_only_command in command for read_only_command in READ_ONLY_COMMANDS
+            ):
+                logger.error(
+                    f"{e.__class__.__name__} on SSH connection to {instance_ip} while executing '{command}'. Not retrying."
+                )
+                raise
+
+            logger.warning(
+                f"{e.__class__.__name__} on SSH connection to {instance_ip}. Reconnecting."
+            )
+            ssh_client = await get_connection(
+                discord_client=discord_client, instance_ip=instance_ip
+            )
+
+            exit_status, output, error = await exec_command(
+                discord_client=discord_client, ssh_client=ssh_client, command=command
             )
 
-            if command == "./read_console_log":
+        if exit_status == 0:
+            if "./read_console_log" in command:
                 console_log = output
 
             else:
+                output = output.decode("utf-8").strip()
                 logger.info(output)
                 if command == "./get_start_timestamp":
-                    session_manager.server_start_timestamp = output.split("=")[1]
+                    session_manager.server_start_timestamps[instance_name] = output.split(
+                        "="
+                    )[1]
 
         else:
-            error = await discord_client.loop.run_in_executor(
-                executor=ssh_command_executor,
-                func=lambda: stderr.read().decode("utf-8").strip(),
-            )
-
+            error = error.decode("utf-8").strip()
             logger.error(f"Error executing '{command}': {error}")
 
-    ssh_client.close()
-
-    if console_log:
+    if console_log is not None:
         return console_log
 
     return
@@ -1,20 +1,169 @@
 import logging
 import aiohttp
 import asyncio
+import shelve
+import time
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from yarl import URL
-from settings import IPINFO_TOKEN, VPNIO_TOKEN
+from settings import (
+    IPINFO_TOKEN,
+    VPNIO_TOKEN,
+    ENRICHMENT_CACHE_SIZE,
+    ENRICHMENT_CACHE_TTL,
+    ENRICHMENT_CACHE_PATH,
+    ENRICHMENT_CONCURRENCY,
+    ENRICHMENT_BATCH_SIZE,
+    ENRICHMENT_RETRY_LIMIT,
+    IPINFO_URL,
+    IPINFO_RATE_LIMIT,
+    VPNIO_URL,
+    VPNIO_RATE_LIMIT,
+)
+from utils import metrics
 
 logger = logging.getLogger(__name__)
 
+http_session = None
+disk_cache = None
+# shelve is not thread-safe, so every disk cache call runs on one dedicated thread.
+disk_cache_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="disk-cache"
+)
+ip_cache = OrderedDict()
+pending_lookups = {}
+enrichment_semaphore = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+rate_limit_buckets = {
+    provider: {
+        "rate": rate,
+        "capacity": max(rate, 1),
+        "tokens": max(rate, 1),
+        "updated": None,
+    }
+    for provider, rate in [("ipinfo", IPINFO_RATE_LIMIT), ("vpnapi", VPNIO_RATE_LIMIT)]
+}
 
-async def fetch_url(session, url, params=None):
+
+async def get_http_session():
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+
+    return http_session
+
+
+def open_disk_cache():
+    global disk_cache
+    if disk_cache is None:
+        disk_cache = shelve.open(ENRICHMENT_CACHE_PATH)
+
+    return disk_cache
+
+
+async def run_disk_cache(func):
+    if not ENRICHMENT_CACHE_PATH:
+        return None
+
+    result = await asyncio.get_running_loop().run_in_executor(
+        executor=disk_cache_executor, func=lambda: func(open_disk_cache())
+    )
+
+    return result
+
+
+async def acquire_token(provider):
+    bucket = rate_limit_buckets[provider]
+    while True:
+        now = time.monotonic()
+        if bucket["updated"] is not None:
+            elapsed = now - bucket["updated"]
+            bucket["tokens"] = min(
+                bucket["capacity"], bucket["tokens"] + elapsed * bucket["rate"]
+            )
+
+        bucket["updated"] = now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            return
+
+        await asyncio.sleep((1 - bucket["tokens"]) / bucket["rate"])
+
+
+async def remember_cache_entry(cache_key, cache_entry):
+    ip_cache[cache_key] = cache_entry
+    ip_cache.move_to_end(cache_key)
+    while len(ip_cache) > ENRICHMENT_CACHE_SIZE:
+        ip_cache.popitem(last=False)
+
+
+async def get_cached(cache_key):
+    cache_entry = ip_cache.get(cache_key)
+    if cache_entry is None:
+        cache_entry = await run_disk_cache(
+            lambda cache_store: cache_store.get(cache_key)
+        )
+
+    if cache_entry is None:
+        return None
+
+    if cache_entry["expires"] < time.time():
+        ip_cache.pop(cache_key, None)
+        return None
+
+    await remember_cache_entry(cache_key, cache_entry)
+
+    return cache_entry["data"]
+
+
+async def set_cached(cache_key, data):
+    cache_entry = {"expires": time.time() + ENRICHMENT_CACHE_TTL, "data": data}
+    await remember_cache_entry(cache_key, cache_entry)
+
+    def write_entry(cache_store):
+        cache_store[cache_key] = cache_entry
+        cache_store.sync()
+
+    await run_disk_cache(write_entry)
+
+
+async def cached_lookup(provider, ip_address, lookup):
+    cache_key = f"{provider}:{ip_address}"
+    data = await get_cached(cache_key)
+    if data is not None:
+        return data
+
+    # Concurrent lookups of the same IP wait for the request already in flight.
+    pending_lookup = pending_lookups.get(cache_key)
+    if pending_lookup:
+        return await asyncio.shield(pending_lookup)
+
+    pending_lookup = asyncio.ensure_future(lookup(ip_address))
+    pending_lookups[cache_key] = pending_lookup
     try:
-        async with session.get(url, params=params) as response:
+        data = await asyncio.shield(pending_lookup)
+
+    finally:
+        pending_lookups.pop(cache_key, None)
+
+    if data is not None:
+        await set_cached(cache_key, data)
+
+    return data
+
+
+async def fetch_url(session, url, params=None, json=None):
+    method = "POST" if json is not None else "GET"
+    try:
+        async with session.request(method, url, params=params, json=json) as response:
             response.raise_for_status()
             return await response.json()
 
     except aiohttp.ClientResponseError as e:
+        # Rate-limited requests are retried by throttled_fetch.
+        if e.status == 429:
+            raise
+
         logger.error(f"ClientResponseError: {e}")
 
     except aiohttp.ClientConnectionError as e:
@@ -29,63 +178,135 @@ async def fetch_url(session, url, params=None):
     return None
 
 
+async def get_retry_delay(response_error):
+    retry_after = (response_error.headers or {}).get("Retry-After")
+    try:
+        return float(retry_after)
+
+    except (TypeError, ValueError):
+        return 1.0
+
+
+async def throttled_fetch(provider, url, params=None, json=None):
+    for attempt in range(ENRICHMENT_RETRY_LIMIT + 1):
+        async with enrichment_semaphore:
+            await acquire_token(provider)
+            session = await get_http_session()
+            try:
+                with metrics.measure_stage("enrichment", provider=provider):
+                    data = await fetch_url(session, url, params=params, json=json)
+
+                return data
+
+            except aiohttp.ClientResponseError as e:
+                retry_delay = await get_retry_delay(e)
+
+        # Sleep outside the semaphore so other lookups keep their slots.
+        logger.warning(
+            f"{provider} rate limited. Retrying in {retry_delay}s. Attempt: {attempt}"
+        )
+        await asyncio.sleep(retry_delay)
+
+    logger.error(
+        f"{provider} still rate limited after {ENRICHMENT_RETRY_LIMIT} retries: {url}"
+    )
+
+    return None
+
+
+async def create_ip_attributes(ip_data):
+    latlong = ip_data.get("loc").split(",")
+    ip_attributes = {
+        "City": ip_data.get("city"),
+        "Region": ip_data.get("region"),
+        "Postal Code": ip_data.get("postal"),
+        "Latitude": latlong[0],
+        "Longitude": latlong[1],
+        "ISP": ip_data.get("org"),
+        "Country": ip_data.get("country"),
+    }
+
+    return ip_attributes
+
+
 async def get_ip_attributes(ip_address):
-    url = URL("http://ipinfo.io/").with_path(ip_address)
+    url = URL(IPINFO_URL) / ip_address
     params = {"token": IPINFO_TOKEN}
-    async with aiohttp.ClientSession(
-        timeout=aiohttp.ClientTimeout(total=10)
-    ) as session:
-        ip_data = await fetch_url(session, url, params)
-        if ip_data:
-            latlong = ip_data.get("loc").split(",")
-            ip_attributes = {
-                "City": ip_data.get("city"),
-                "Region": ip_data.get("region"),
-                "Postal Code": ip_data.get("postal"),
-                "Latitude": latlong[0],
-                "Longitude": latlong[1],
-                "ISP": ip_data.get("org"),
-                "Country": ip_data.get("country"),
-            }
-
-            return ip_attributes
+    ip_data = await throttled_fetch("ipinfo", url, params=params)
+    if ip_data:
+        ip_attributes = await create_ip_attributes(ip_data)
 
-        return None
+        return ip_attributes
+
+    return None
+
+
+async def get_ip_attributes_batch(ip_addresses):
+    url = URL(IPINFO_URL) / "batch"
+    params = {"token": IPINFO_TOKEN}
+    batch_data = await throttled_fetch("ipinfo", url, params=params, json=ip_addresses)
+    if not batch_data:
+        return
+
+    for ip_address, ip_data in batch_data.items():
+        if isinstance(ip_data, dict) and ip_data.get("loc"):
+            ip_attributes = await create_ip_attributes(ip_data)
+            await set_cached(f"ipinfo:{ip_address}", ip_attributes)
+
+
+async def prefetch_ip_attributes(ip_log_data):
+    ip_addresses = {event["IP Address"] for event in ip_log_data if event.get("IP Address")}
+    uncached_ip_addresses = [
+        ip_address
+        for ip_address in ip_addresses
+        if await get_cached(f"ipinfo:{ip_address}") is None
+    ]
+
+    batches = [
+        uncached_ip_addresses[i : i + ENRICHMENT_BATCH_SIZE]
+        for i in range(0, len(uncached_ip_addresses), ENRICHMENT_BATCH_SIZE)
+    ]
+
+    await asyncio.gather(*[get_ip_attributes_batch(batch) for batch in batches])
 
 
 async def get_obfuscation_flags(ip_address):
-    url = URL("https://vpnapi.io/api/") / ip_address
+    url = URL(VPNIO_URL) / ip_address
     params = {"key": VPNIO_TOKEN}
-    async with aiohttp.ClientSession(
-        timeout=aiohttp.ClientTimeout(total=10)
-    ) as session:
-        obfuscation_flag = await fetch_url(session, url, params)
-        if obfuscation_flag:
-            obfuscation_attributes = {
-                key.upper() if key == "vpn" else key.title(): value
-                for key, value in obfuscation_flag["security"].items()
-            }
-
-            return obfuscation_attributes
+    obfuscation_flag = await throttled_fetch("vpnapi", url, params=params)
+    if obfuscation_flag:
+        obfuscation_attributes = {
+            key.upper() if key == "vpn" else key.title(): value
+            for key, value in obfuscation_flag["security"].items()
+        }
 
-        return None
+        return obfuscation_attributes
+
+    return None
 
 
 async def enrich_event(event):
     ip_address = event.get("IP Address")
     if ip_address:
         attributes_data = await asyncio.gather(
-            get_ip_attributes(ip_address), get_obfuscation_flags(ip_address)
+            cached_lookup("ipinfo", ip_address, get_ip_attributes),
+            cached_lookup("vpnapi", ip_address, get_obfuscation_flags),
         )
 
         ip_attributes = attributes_data[0]
-        event.update(ip_attributes)
+        if ip_attributes:
+            event.update(ip_attributes)
 
         obfuscation_attributes = attributes_data[1]
-        event.update(obfuscation_attributes)
+        if obfuscation_attributes:
+            event.update(obfuscation_attributes)
 
 
 async def enrich_data(ip_log_data):
+    # vpnapi.io has no bulk endpoint, so only ipinfo lookups are batched.
+    if ENRICHMENT_BATCH_SIZE:
+        await prefetch_ip_attributes(ip_log_data)
+
     tasks = [enrich_event(event) for event in ip_log_data]
     await asyncio.gather(*tasks)
 
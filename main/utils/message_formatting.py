@@ -2,10 +2,16 @@ import logging
 
 from datetime import datetime
 from discord import Embed
-from settings import AUTHORIZED_CHANNELS
+from settings import AUTHORIZED_CHANNELS, SCOREBOARD_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 
+SCOREBOARD_SORT_KEYS = {
+    "score": lambda player: player.score,
+    "uptime": lambda player: player.duration,
+}
+SCOREBOARD_NAME_WIDTH = 20
+
 
 async def authorize_discord_channels(discord_client):
     channels = [
@@ -19,6 +25,13 @@ async def create_logger_info_message(command, message, instance_name, zone):
     return f"[{command}] {message} instance: {instance_name} zone: {zone}"
 
 
+async def create_no_instance_message(selector):
+    if selector is None:
+        return "No NATOPS instance found."
+
+    return f"No NATOPS instance matches `{selector}`."
+
+
 async def embify(title, description):
     discord_embed = Embed(title=title, description=description, color=0xE74C3C)
 
@@ -32,6 +45,38 @@ async def populate_embed_fields(discord_embed, fields):
     return discord_embed
 
 
+async def create_scoreboard_embeds(players, sort_by="score"):
+    players = sorted(players, key=SCOREBOARD_SORT_KEYS[sort_by], reverse=True)
+    header = f"{'#':>3} {'Name':<{SCOREBOARD_NAME_WIDTH}} {'Score':>6} {'Uptime':>7}"
+
+    rows = []
+    for rank, player in enumerate(players, start=1):
+        # Names are truncated so the code block keeps its columns aligned.
+        name = (player.name or "(connecting)")[:SCOREBOARD_NAME_WIDTH].replace("`", "'")
+        uptime = f"{int(player.duration // 60)}m"
+        rows.append(
+            f"{rank:>3} {name:<{SCOREBOARD_NAME_WIDTH}} {player.score:>6} {uptime:>7}"
+        )
+
+    pages = [
+        rows[i : i + SCOREBOARD_PAGE_SIZE]
+        for i in range(0, len(rows), SCOREBOARD_PAGE_SIZE)
+    ]
+
+    scoreboard_embeds = [
+        await embify(
+            title=f"Player Score ({page_number}/{len(pages)})",
+            description="```\n" + "\n".join([header] + page) + "\n```",
+        )
+        for page_number, page in enumerate(pages, start=1)
+    ]
+
+    for scoreboard_embed in scoreboard_embeds:
+        scoreboard_embed.set_footer(text=f"Sorted by {sort_by}")
+
+    return scoreboard_embeds
+
+
 async def create_log_event_embed(log_data):
     discord_embed = await embify(
         title="Player Connected Event", description="Timezone: UTC"
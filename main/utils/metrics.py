@@ -0,0 +1,90 @@
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cached lookup to a GCE start operation.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+stage_histograms = {}
+stage_errors = {}
+
+
+def observe_stage(stage, elapsed_time, **labels):
+    # Hot path: one dict lookup and a bisect per observation; buckets are only summed when scraped.
+    histogram_key = (stage, tuple(sorted(labels.items())))
+    histogram = stage_histograms.get(histogram_key)
+    if histogram is None:
+        histogram = {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0}
+        stage_histograms[histogram_key] = histogram
+
+    histogram["buckets"][bisect_left(LATENCY_BUCKETS, elapsed_time)] += 1
+    histogram["sum"] += elapsed_time
+
+
+def count_stage_error(stage, **labels):
+    error_key = (stage, tuple(sorted(labels.items())))
+    stage_errors[error_key] = stage_errors.get(error_key, 0) + 1
+
+
+@contextmanager
+def measure_stage(stage, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+
+    except Exception:
+        count_stage_error(stage, **labels)
+        raise
+
+    finally:
+        observe_stage(stage, time.perf_counter() - started, **labels)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(stage, labels, **extra_labels):
+    label_pairs = [("stage", stage)] + list(labels) + list(extra_labels.items())
+    formatted_labels = ",".join(
+        f'{name}="{escape_label_value(value)}"' for name, value in label_pairs
+    )
+
+    return "{" + formatted_labels + "}"
+
+
+async def render_metrics():
+    lines = [
+        "# HELP natops_stage_duration_seconds Latency of each pipeline stage.",
+        "# TYPE natops_stage_duration_seconds histogram",
+    ]
+
+    for (stage, labels), histogram in sorted(stage_histograms.items()):
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(
+            LATENCY_BUCKETS + ("+Inf",), histogram["buckets"]
+        ):
+            cumulative_count += bucket_count
+            lines.append(
+                f"natops_stage_duration_seconds_bucket{format_labels(stage, labels, le=upper_bound)} {cumulative_count}"
+            )
+
+        lines.append(
+            f"natops_stage_duration_seconds_sum{format_labels(stage, labels)} {histogram['sum']}"
+        )
+        lines.append(
+            f"natops_stage_duration_seconds_count{format_labels(stage, labels)} {cumulative_count}"
+        )
+
+    lines += [
+        "# HELP natops_stage_errors_total Pipeline stage calls that raised.",
+        "# TYPE natops_stage_errors_total counter",
+    ]
+
+    for (stage, labels), error_count in sorted(stage_errors.items()):
+        lines.append(
+            f"natops_stage_errors_total{format_labels(stage, labels)} {error_count}"
+        )
+
+    return "\n".join(lines) + "\n"
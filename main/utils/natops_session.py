@@ -1,12 +1,16 @@
 import logging
 import asyncio
+import time
 
 from a2s import ainfo, aplayers
-from utils import message_formatting
+from utils import message_formatting, metrics
+from settings import A2S_CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
 NATOPS_QUERY_PORT = 2303
+a2s_cache = {}
+a2s_requests = {}
 
 
 async def exponential_backoff_query(natops_socket, flag):
@@ -22,8 +26,23 @@ async def exponential_backoff_query(natops_socket, flag):
 
     while attempt < MAX_RETRIES:
         try:
-            natops_session = await ainfo(natops_socket)
-            return natops_session
+            with metrics.measure_stage("a2s_query"):
+                natops_info, natops_players = await asyncio.gather(
+                    ainfo(natops_socket), aplayers(natops_socket), return_exceptions=True
+                )
+
+            if isinstance(natops_info, Exception):
+                raise natops_info
+
+            # A failed player query should not discard a successful info query.
+            if isinstance(natops_players, Exception):
+                logger.warning(
+                    f"Player query failed: {natops_players.__class__.__name__}: {natops_players}"
+                )
+                natops_players = []
+
+            a2s_response = {"info": natops_info, "players": natops_players}
+            return a2s_response
 
         except (ConnectionRefusedError, asyncio.TimeoutError) as e:
             if flag == "no-retry":
@@ -41,15 +60,50 @@ async def exponential_backoff_query(natops_socket, flag):
             raise
 
 
+async def fetch_a2s_response(natops_socket, flag):
+    try:
+        a2s_response = await exponential_backoff_query(
+            natops_socket=natops_socket, flag=flag
+        )
+
+    finally:
+        a2s_requests.pop((natops_socket, flag), None)
+
+    if a2s_response:
+        a2s_cache[natops_socket] = {
+            "a2s_response": a2s_response,
+            "updated": time.monotonic(),
+        }
+
+    return a2s_response
+
+
+async def query_a2s(natops_socket, flag=None):
+    cached_response = a2s_cache.get(natops_socket)
+    if cached_response and time.monotonic() - cached_response["updated"] <= A2S_CACHE_TTL:
+        return cached_response["a2s_response"]
+
+    # Callers checking status at the same time share one UDP exchange.
+    a2s_request = a2s_requests.get((natops_socket, flag))
+    if not a2s_request:
+        a2s_request = asyncio.ensure_future(
+            fetch_a2s_response(natops_socket=natops_socket, flag=flag)
+        )
+        a2s_requests[(natops_socket, flag)] = a2s_request
+
+    a2s_response = await asyncio.shield(a2s_request)
+    return a2s_response
+
+
 async def query_natops_session(instance_ip, flag=None):
     natops_socket = (instance_ip, NATOPS_QUERY_PORT)
-    natops_session = await exponential_backoff_query(
-        natops_socket=natops_socket, flag=flag
-    )
+    a2s_response = await query_a2s(natops_socket=natops_socket, flag=flag)
 
-    if not natops_session:
+    if not a2s_response:
         return
 
+    natops_session = a2s_response["info"]
+
     natops_embeds = {}
 
     session_embed_header = await message_formatting.embify(
@@ -74,22 +128,7 @@ async def query_natops_session(instance_ip, flag=None):
 
     natops_embeds["session_embed"] = session_embed
 
-    if natops_session.player_count > 0:
-        natops_players = await aplayers(natops_socket)
-        players_embed = [
-            await message_formatting.populate_embed_fields(
-                discord_embed=await message_formatting.embify(
-                    title="Player Score", description=None
-                ),
-                fields=[
-                    ("__Name__", player.name),
-                    ("__Kill Score__", player.score),
-                    ("__Uptime__", f"{player.duration // 60} minute(s)"),
-                ],
-            )
-            for player in natops_players
-        ]
-
-        natops_embeds["players_embed"] = players_embed
+    # Player embeds are rendered on demand by the status command.
+    natops_embeds["players"] = a2s_response["players"]
 
     return natops_embeds
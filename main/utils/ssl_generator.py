@@ -1,6 +1,10 @@
+import asyncio
+import os
+import tempfile
+
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives.serialization import (
     Encoding,
     PrivateFormat,
@@ -10,12 +14,16 @@ from cryptography.hazmat.primitives.serialization import (
 from cryptography.x509.oid import NameOID
 from datetime import datetime, timezone, timedelta
 
+ssl_state = {"private_key": None, "directory": None}
 
-async def generate_ssl_pair():
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-    )
+
+def create_ssl_pair():
+    # The key is generated once and reused; each call only signs a fresh certificate.
+    if ssl_state["private_key"] is None:
+        ssl_state["private_key"] = ec.generate_private_key(ec.SECP256R1())
+        ssl_state["directory"] = tempfile.mkdtemp(prefix="natops-tls-")
+
+    private_key = ssl_state["private_key"]
 
     subject = issuer = x509.Name(
         [
@@ -48,13 +56,15 @@ async def generate_ssl_pair():
 
     certificate_bytes = certificate.public_bytes(Encoding.PEM)
 
-    certfile_path = "certfile.crt"
-    keyfile_path = "keyfile.key"
+    certfile_path = os.path.join(ssl_state["directory"], "certfile.crt")
+    keyfile_path = os.path.join(ssl_state["directory"], "keyfile.key")
 
     with open(certfile_path, "wb") as cert_file:
         cert_file.write(certificate_bytes)
 
-    with open(keyfile_path, "wb") as key_file:
+    with open(
+        os.open(keyfile_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb"
+    ) as key_file:
         key_file.write(private_key_bytes)
 
     ssl_pair = {
@@ -63,3 +73,10 @@ async def generate_ssl_pair():
     }
 
     return ssl_pair
+
+
+async def generate_ssl_pair():
+    loop = asyncio.get_running_loop()
+    ssl_pair = await loop.run_in_executor(executor=None, func=create_ssl_pair)
+
+    return ssl_pair
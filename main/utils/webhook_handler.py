@@ -1,37 +1,190 @@
 import logging
+import asyncio
 
-from utils import compute_engine, message_formatting, connecting_event
+from datetime import datetime, timezone
+
+from utils import (
+    compute_engine,
+    message_formatting,
+    connecting_event,
+    discord_delivery,
+    event_store,
+    webhook_spool,
+)
 from bot_commands import session_manager
+from settings import WEBHOOK_COALESCE_SECONDS
 
 logger = logging.getLogger(__name__)
+webhook_ingestion = {"queue": None, "consumer": None}
+
+
+async def enqueue_event(discord_client, webhook_event):
+    if webhook_ingestion["queue"] is None:
+        webhook_ingestion["queue"] = asyncio.Queue()
+
+    webhook_ingestion["queue"].put_nowait(webhook_event)
+
+    consumer = webhook_ingestion["consumer"]
+    if consumer is None or consumer.done():
+        webhook_ingestion["consumer"] = discord_client.loop.create_task(
+            consume_events(discord_client=discord_client)
+        )
+
+
+async def consume_events(discord_client):
+    webhook_queue = webhook_ingestion["queue"]
+    while True:
+        webhook_events = [await webhook_queue.get()]
+
+        # Alerts arriving within the window share one pipeline run.
+        await asyncio.sleep(WEBHOOK_COALESCE_SECONDS)
+        while not webhook_queue.empty():
+            webhook_events.append(webhook_queue.get_nowait())
+
+        logger.info(
+            f"Processing {len(webhook_events)} coalesced connecting-event payload(s)."
+        )
+
+        incident_ids = [webhook_event["incident_id"] for webhook_event in webhook_events]
+        try:
+            alert_started = await earliest_alert_time(incident_ids)
+            await process_event(
+                discord_client=discord_client, alert_started=alert_started
+            )
+
+        except Exception as e:
+            logger.error(f"Error while processing connecting-event: {e}")
+
+            # Failed incidents stay pending in the spool and are retried up to WEBHOOK_RETRY_LIMIT times.
+            retry_ids = await webhook_spool.fail(incident_ids)
+            for incident_id in retry_ids:
+                webhook_queue.put_nowait({"incident_id": incident_id})
 
+        else:
+            await webhook_spool.complete(incident_ids)
 
-async def process_event(discord_client):
+        finally:
+            for _ in webhook_events:
+                webhook_queue.task_done()
+
+
+async def replay_spool(discord_client):
+    pending_payloads = await webhook_spool.pending_payloads()
+    for incident_id in pending_payloads:
+        await enqueue_event(
+            discord_client=discord_client, webhook_event={"incident_id": incident_id}
+        )
+
+    if pending_payloads:
+        logger.info(f"Replaying {len(pending_payloads)} spooled webhook payload(s).")
+
+
+async def earliest_alert_time(incident_ids):
+    pending_payloads = await webhook_spool.pending_payloads()
+    started_times = [
+        pending_payloads[incident_id]["incident"].get("started_at")
+        for incident_id in incident_ids
+        if incident_id in pending_payloads
+    ]
+    started_times = [started_at for started_at in started_times if started_at]
+
+    if not started_times:
+        return None
+
+    return datetime.fromtimestamp(min(started_times), tz=timezone.utc)
+
+
+async def process_event(discord_client, alert_started=None):
     source = "connecting-event-endpoint"
     channels = await message_formatting.authorize_discord_channels(
         discord_client=discord_client
     )
 
-    instance = await compute_engine.get_instance(discord_client=discord_client)
-    message = "Reading NATOPS console log from instance..."
-    logger_info_message = await message_formatting.create_logger_info_message(
-        command=source,
-        message=message,
-        instance_name=instance["instance_name"],
-        zone=instance["zone"],
-    )
+    # The alert does not name the instance, so every running session is checked.
+    instances = await compute_engine.get_instances(discord_client=discord_client)
 
-    logger.info(logger_info_message)
+    # Session state is empty until the first health check after a restart, so unknown instances are queried now.
+    unknown_instances = [
+        instance
+        for instance in instances
+        if instance["instance_name"] not in session_manager.session_running
+    ]
+
+    failed_instances = 0
+    if unknown_instances:
+        fleet_attributes = await compute_engine.fleet_health_check(
+            discord_client=discord_client,
+            instances=unknown_instances,
+            flag="query-natops",
+        )
 
-    console_log_file = await compute_engine.read_console_log(
-        discord_client=discord_client, instance=instance
+        for instance, instance_attributes in fleet_attributes:
+            if isinstance(instance_attributes, Exception):
+                failed_instances += 1
+                logger.error(
+                    f"Health check failed for {instance['instance_name']}: {instance_attributes}"
+                )
+
+    instances = [
+        instance
+        for instance in instances
+        if instance["instance_name"] in session_manager.session_running
+    ]
+
+    if not instances:
+        if failed_instances:
+            raise RuntimeError(
+                f"NATOPS session state unknown for {failed_instances} instance(s)."
+            )
+
+        logger.warning("Connecting-event received with no NATOPS session running.")
+        return
+
+    fleet_results = await compute_engine.map_fleet(
+        instances=instances,
+        func=lambda instance: process_instance_event(
+            discord_client=discord_client,
+            instance=instance,
+            channels=channels,
+            source=source,
+            alert_started=alert_started,
+        ),
     )
 
-    server_start_datetime = await message_formatting.format_start_datetime(
-        session_manager.server_start_timestamp
+    reporting_instances = 0
+    for instance, fleet_result in fleet_results:
+        if isinstance(fleet_result, Exception):
+            failed_instances += 1
+            logger.error(
+                f"Error while processing connecting-event for {instance['instance_name']}: {fleet_result}"
+            )
+
+        elif fleet_result != "No player connected.":
+            reporting_instances += 1
+
+    if failed_instances:
+        raise RuntimeError(
+            f"Connecting-event failed on {failed_instances} instance(s)."
+        )
+
+    # Idle instances are expected in a fleet; only report when no instance has any connection.
+    # Re-reading the same log would not change the outcome, so this completes instead of being retried.
+    if not reporting_instances:
+        message = "Failed to retrieve connecting player log."
+        await discord_delivery.broadcast(channels=channels, content=message)
+        logger.error(message)
+
+    return
+
+
+async def process_instance_event(
+    discord_client, instance, channels, source, alert_started=None
+):
+    server_start_timestamp = session_manager.server_start_timestamps.get(
+        instance["instance_name"]
     )
 
-    message = "Parsing NATOPS console log..."
+    message = "Reading NATOPS console log from instance..."
     logger_info_message = await message_formatting.create_logger_info_message(
         command=source,
         message=message,
@@ -41,29 +194,59 @@ async def process_event(discord_client):
 
     logger.info(logger_info_message)
 
-    event_log = await connecting_event.construct_event_log(
-        discord_client=discord_client,
-        argument=source,
-        instance=instance,
-        console_log_file=console_log_file,
-        server_start_date=server_start_datetime["start_date_object"],
-        flag="webhook",
+    # Reads and parses of one session are serialised so the parser always resumes where the last read ended.
+    session_key = await session_manager.get_session_key(instance)
+    console_log_lock = await compute_engine.get_console_log_lock(
+        instance=instance, session_key=session_key
     )
 
+    async with console_log_lock:
+        console_log_read = await compute_engine.read_console_log(
+            discord_client=discord_client,
+            instance=instance,
+            session_key=session_key,
+        )
+
+        server_start_datetime = await message_formatting.format_start_datetime(
+            server_start_timestamp
+        )
+
+        message = "Parsing NATOPS console log..."
+        logger_info_message = await message_formatting.create_logger_info_message(
+            command=source,
+            message=message,
+            instance_name=instance["instance_name"],
+            zone=instance["zone"],
+        )
+
+        logger.info(logger_info_message)
+
+        event_log = await connecting_event.construct_event_log(
+            discord_client=discord_client,
+            argument=source,
+            instance=instance,
+            console_log_file=console_log_read["console_log_file"],
+            server_start_date=server_start_datetime["start_date_object"],
+            session_key=session_key,
+            log_offset=console_log_read["log_offset"],
+            flag="webhook",
+            alert_started=alert_started,
+        )
+
     if isinstance(event_log, str):
-        if event_log == "No player connected.":
-            message = "Failed to retrieve connecting player log."
-            for channel in channels:
-                await channel.send(content=message)
+        return event_log
 
-            raise ValueError(message)
+    embeds = [
+        await message_formatting.create_log_event_embed(log_data=event)
+        for event in event_log
+    ]
 
-    embed = await message_formatting.create_log_event_embed(log_data=event_log[0])
+    queued_channels = await discord_delivery.broadcast(channels=channels, embeds=embeds)
 
-    for channel in channels:
-        await channel.send(embed=embed)
+    if session_key:
+        await event_store.mark_notified(session_key=session_key, events=event_log)
 
-    message = f"Event data sent to {len(channels)} authorized channel(s)."
+    message = f"{len(event_log)} event(s) data queued for {queued_channels} authorized channel(s)."
     logger_info_message = await message_formatting.create_logger_info_message(
         command=source,
         message=message,
@@ -73,4 +256,4 @@ async def process_event(discord_client):
 
     logger.info(logger_info_message)
 
-    return
+    return event_log
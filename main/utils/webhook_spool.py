@@ -0,0 +1,223 @@
+import logging
+import asyncio
+import json
+import os
+import uuid
+
+from collections import deque
+from settings import WEBHOOK_SPOOL_PATH, WEBHOOK_SPOOL_HISTORY, WEBHOOK_RETRY_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Accepted payloads are appended as JSON lines; a later "done" record for the same incident marks it processed
+# and each "failed" record counts one unsuccessful pipeline run.
+spool_state = {
+    "loaded": False,
+    "history": deque(),
+    "seen": set(),
+    "pending": {},
+    "failures": {},
+    "records": 0,
+}
+spool_lock = asyncio.Lock()
+
+
+def write_records(records, mode):
+    with open(WEBHOOK_SPOOL_PATH, mode) as spool_file:
+        for record in records:
+            spool_file.write(json.dumps(record) + "\n")
+
+        spool_file.flush()
+        os.fsync(spool_file.fileno())
+
+
+def replace_records(records):
+    # Rewrite into a temporary file first so a crash mid-compaction keeps the old spool.
+    temp_path = f"{WEBHOOK_SPOOL_PATH}.tmp"
+    with open(temp_path, "w") as spool_file:
+        for record in records:
+            spool_file.write(json.dumps(record) + "\n")
+
+        spool_file.flush()
+        os.fsync(spool_file.fileno())
+
+    os.replace(temp_path, WEBHOOK_SPOOL_PATH)
+
+
+async def append_records(records):
+    await asyncio.get_running_loop().run_in_executor(
+        executor=None, func=lambda: write_records(records, "a")
+    )
+
+    spool_state["records"] += len(records)
+
+
+async def compact_spool():
+    # Keep pending payloads and enough processed IDs to deduplicate retries.
+    compacted_records = [
+        {"incident_id": incident_id, "done": True}
+        for incident_id in spool_state["history"]
+    ] + [
+        {
+            "incident_id": incident_id,
+            "payload": payload,
+            "failures": spool_state["failures"][incident_id],
+        }
+        for incident_id, payload in spool_state["pending"].items()
+    ]
+
+    await asyncio.get_running_loop().run_in_executor(
+        executor=None, func=lambda: replace_records(compacted_records)
+    )
+
+    spool_state["records"] = len(compacted_records)
+
+
+async def compact_if_needed():
+    # Appends grow the file while the bot runs; rewrite it once WEBHOOK_SPOOL_HISTORY records are redundant.
+    compacted_size = len(spool_state["history"]) + len(spool_state["pending"])
+    if spool_state["records"] > compacted_size + WEBHOOK_SPOOL_HISTORY:
+        await compact_spool()
+
+
+def remember_processed(incident_id):
+    # Processed IDs are kept in arrival order so the oldest falls out of the dedupe set first.
+    spool_state["history"].append(incident_id)
+    spool_state["seen"].add(incident_id)
+    while len(spool_state["history"]) > WEBHOOK_SPOOL_HISTORY:
+        spool_state["seen"].discard(spool_state["history"].popleft())
+
+
+def read_records():
+    if not os.path.exists(WEBHOOK_SPOOL_PATH):
+        return []
+
+    records = []
+    with open(WEBHOOK_SPOOL_PATH) as spool_file:
+        for line in spool_file:
+            try:
+                records.append(json.loads(line))
+
+            except json.JSONDecodeError:
+                # A crash mid-append can leave a truncated last line.
+                logger.warning("Skipping unreadable webhook spool record.")
+
+    return records
+
+
+async def load_spool():
+    loop = asyncio.get_running_loop()
+    records = await loop.run_in_executor(executor=None, func=read_records)
+
+    processed = {}
+    pending = {}
+    failures = {}
+    for record in records:
+        incident_id = record["incident_id"]
+        if record.get("done"):
+            pending.pop(incident_id, None)
+            failures.pop(incident_id, None)
+            processed.pop(incident_id, None)
+            processed[incident_id] = True
+
+        elif record.get("failed"):
+            failures[incident_id] = failures.get(incident_id, 0) + 1
+
+        else:
+            pending[incident_id] = record["payload"]
+            failures[incident_id] = record.get("failures", 0)
+
+    history = list(processed)[-WEBHOOK_SPOOL_HISTORY:]
+    spool_state["history"] = deque(history)
+    spool_state["seen"] = set(history)
+    spool_state["pending"] = pending
+    spool_state["failures"] = failures
+
+    await compact_spool()
+    spool_state["loaded"] = True
+
+    if pending:
+        logger.info(f"Loaded {len(pending)} pending webhook payload(s) from spool.")
+
+
+async def accept(payload):
+    incident_id = payload["incident"].get("incident_id") or str(uuid.uuid4())
+
+    async with spool_lock:
+        if not spool_state["loaded"]:
+            await load_spool()
+
+        if incident_id in spool_state["seen"] or incident_id in spool_state["pending"]:
+            logger.info(f"Duplicate webhook payload for incident {incident_id}.")
+            return None
+
+        record = {"incident_id": incident_id, "payload": payload}
+        await append_records([record])
+
+        spool_state["pending"][incident_id] = payload
+        spool_state["failures"][incident_id] = 0
+
+    return incident_id
+
+
+async def complete(incident_ids):
+    records = [
+        {"incident_id": incident_id, "done": True}
+        for incident_id in incident_ids
+        if incident_id
+    ]
+
+    async with spool_lock:
+        await append_records(records)
+
+        for incident_id in incident_ids:
+            if incident_id:
+                spool_state["pending"].pop(incident_id, None)
+                spool_state["failures"].pop(incident_id, None)
+                remember_processed(incident_id)
+
+        await compact_if_needed()
+
+
+async def fail(incident_ids):
+    async with spool_lock:
+        incident_ids = [
+            incident_id
+            for incident_id in incident_ids
+            if incident_id in spool_state["pending"]
+        ]
+        records = [
+            {"incident_id": incident_id, "failed": True} for incident_id in incident_ids
+        ]
+
+        await append_records(records)
+
+        retry_ids = []
+        for incident_id in incident_ids:
+            spool_state["failures"][incident_id] += 1
+            if spool_state["failures"][incident_id] < WEBHOOK_RETRY_LIMIT:
+                retry_ids.append(incident_id)
+
+            else:
+                logger.error(
+                    f"Giving up on webhook incident {incident_id} after {WEBHOOK_RETRY_LIMIT} failed attempt(s)."
+                )
+
+        await compact_if_needed()
+
+    # Incidents over the retry limit are marked done so they are not replayed on every restart.
+    abandoned_ids = [
+        incident_id for incident_id in incident_ids if incident_id not in retry_ids
+    ]
+    if abandoned_ids:
+        await complete(abandoned_ids)
+
+    return retry_ids
+
+
+async def pending_payloads():
+    async with spool_lock:
+        if not spool_state["loaded"]:
+            await load_spool()
+
+        return dict(spool_state["pending"])
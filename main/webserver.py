@@ -1,50 +1,184 @@
 import logging
+import asyncio
+import socket
 import ssl
 import base64
+import time
 
 from aiohttp import web
-from utils import ssl_generator, webhook_handler
+from utils import metrics, webhook_handler, webhook_spool
 from settings import (
     WEBHOOK_PORT,
     WEBHOOK_AUTH_USERNAME,
     WEBHOOK_AUTH_PASSWORD,
     GOOGLE_CLOUD_PROJECT,
+    WEBHOOK_TLS_MODE,
+    WEBHOOK_TLS_CERTFILE,
+    WEBHOOK_TLS_KEYFILE,
+    WEBHOOK_DRAIN_TIMEOUT,
 )
 
 logger = logging.getLogger(__name__)
+tls_state = {"context": None}
 
 
-async def start_webhook(discord_client):
-    ssl_pair = await ssl_generator.generate_ssl_pair()
+async def load_ssl_context(ssl_pair):
     ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-    ssl_context.load_cert_chain(
-        certfile=ssl_pair["certfile"], keyfile=ssl_pair["keyfile"]
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        executor=None,
+        func=lambda: ssl_context.load_cert_chain(
+            certfile=ssl_pair["certfile"], keyfile=ssl_pair["keyfile"]
+        ),
     )
 
-    webhook = web.Application()
+    return ssl_context
+
+
+async def reload_tls():
+    if WEBHOOK_TLS_MODE == "off":
+        return
+
+    if WEBHOOK_TLS_MODE == "file":
+        ssl_pair = {"certfile": WEBHOOK_TLS_CERTFILE, "keyfile": WEBHOOK_TLS_KEYFILE}
+
+    elif WEBHOOK_TLS_MODE == "self-signed":
+        # cryptography is only needed when a certificate has to be generated.
+        from utils import ssl_generator
+
+        ssl_pair = await ssl_generator.generate_ssl_pair()
+
+    else:
+        raise ValueError(f"Unknown WEBHOOK_TLS_MODE: {WEBHOOK_TLS_MODE}")
+
+    tls_state["context"] = await load_ssl_context(ssl_pair)
+    logger.info(f"Webhook TLS certificate loaded ({WEBHOOK_TLS_MODE}).")
+
+
+def select_ssl_context(ssl_object, server_name, listener_context):
+    # Called by the ssl module during each handshake, so it has to be synchronous.
+    ssl_object.context = tls_state["context"]
+
+
+async def create_listener_context():
+    if WEBHOOK_TLS_MODE == "off":
+        return
+
+    if not tls_state["context"]:
+        await reload_tls()
+
+    # Every handshake switches to the current context, so reload_tls swaps certificates on a live listener.
+    listener_context = tls_state["context"]
+    listener_context.sni_callback = select_ssl_context
+
+    return listener_context
+
+
+async def track_request(request, handler, request_tracker):
+    request_tracker["in_flight"] += 1
+    try:
+        return await handler(request)
+
+    finally:
+        request_tracker["in_flight"] -= 1
+
+
+async def start_webhook(discord_client, sock=None):
+    ssl_context = await create_listener_context()
+
+    request_tracker = {"in_flight": 0}
+    webhook = web.Application(
+        middlewares=[
+            web.middleware(
+                lambda request, handler: track_request(
+                    request, handler, request_tracker
+                )
+            )
+        ]
+    )
     endpoint_path = "/connecting-event"
     webhook.router.add_post(
         path=endpoint_path,
         handler=lambda request: connecting_event_endpoint(request, discord_client),
     )
+    webhook.router.add_get(path="/metrics", handler=metrics_endpoint)
 
     runner = web.AppRunner(webhook)
     await runner.setup()
     webhook_socket = ("0.0.0.0", WEBHOOK_PORT)
 
-    # Google Cloud Platform notification channel webhook does not support self-signed certificate for TLS connection.
+    # A handed-off socket keeps the existing accept queue, so no connection is refused during rotation.
+    if sock:
+        listen_address = {"sock": sock}
+
+    else:
+        listen_address = {"host": webhook_socket[0], "port": webhook_socket[1]}
+
+    # Google Cloud Platform notification channel webhook does not support self-signed certificate, so TLS is off by default.
     webhook_server = await discord_client.loop.create_server(
         protocol_factory=runner.server,
-        host=webhook_socket[0],
-        port=webhook_socket[1],
-        ssl=None,
+        ssl=ssl_context,
+        **listen_address,
     )
 
     logger.info(
         f"Webhook server started at {webhook_socket[0]}:{webhook_socket[1]}{endpoint_path}"
     )
 
-    return webhook_server
+    webhook_listener = {
+        "server": webhook_server,
+        "runner": runner,
+        "request_tracker": request_tracker,
+    }
+
+    return webhook_listener
+
+
+async def drain_webhook(webhook_listener):
+    webhook_listener["server"].close()
+
+    request_tracker = webhook_listener["request_tracker"]
+    deadline = time.monotonic() + WEBHOOK_DRAIN_TIMEOUT
+    while request_tracker["in_flight"] and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    # Requests still running at the deadline are cancelled by the runner cleanup.
+    dropped_requests = request_tracker["in_flight"]
+    await webhook_listener["runner"].cleanup()
+    await webhook_listener["server"].wait_closed()
+
+    return dropped_requests
+
+
+async def rotate_webhook(task_memory, discord_client):
+    webhook_listener = task_memory.get("webhook_listener")
+    if not webhook_listener or not webhook_listener["server"].is_serving():
+        await webhook_health_check(
+            task_memory=task_memory, discord_client=discord_client
+        )
+
+        return
+
+    logger.info("[service-worker] Rotating webhook server...")
+    await reload_tls()
+
+    # The new server accepts on a duplicate of the listening socket before the old one stops accepting.
+    listening_socket = webhook_listener["server"].sockets[0]
+    handoff_socket = socket.fromfd(
+        listening_socket.fileno(), listening_socket.family, listening_socket.type
+    )
+
+    task_memory["webhook_listener"] = await start_webhook(
+        discord_client=discord_client, sock=handoff_socket
+    )
+
+    dropped_requests = await drain_webhook(webhook_listener)
+    logger.info(
+        f"[service-worker] Webhook server rotated. Dropped {dropped_requests} in-flight request(s)."
+    )
+
+    return dropped_requests
 
 
 async def check_basic_auth(auth_header):
@@ -65,15 +199,30 @@ async def check_basic_auth(auth_header):
         return False
 
 
+async def unauthorized_response():
+    error_message = "401 Could not verify your access level for that URL. You have to login with proper credentials"
+    return web.Response(
+        text=error_message,
+        status=401,
+        headers={"WWW-Authenticate": 'Basic realm="Login Required"'},
+    )
+
+
+async def metrics_endpoint(request):
+    auth_header = request.headers.get("Authorization")
+    if not await check_basic_auth(auth_header):
+        return await unauthorized_response()
+
+    metrics_text = await metrics.render_metrics()
+    return web.Response(
+        text=metrics_text, content_type="text/plain", charset="utf-8"
+    )
+
+
 async def connecting_event_endpoint(request, discord_client):
     auth_header = request.headers.get("Authorization")
     if not await check_basic_auth(auth_header):
-        error_message = "401 Could not verify your access level for that URL. You have to login with proper credentials"
-        return web.Response(
-            text=error_message,
-            status=401,
-            headers={"WWW-Authenticate": 'Basic realm="Login Required"'},
-        )
+        return await unauthorized_response()
 
     try:
         payload_data = await request.json()
@@ -87,9 +236,14 @@ async def connecting_event_endpoint(request, discord_client):
             and payload_project_id == GOOGLE_CLOUD_PROJECT
         ):
             logger.info(f"Received connecting-event payload.")
-            discord_client.loop.create_task(
-                webhook_handler.process_event(discord_client=discord_client)
-            )
+
+            # Respond once the payload is durably spooled; duplicates from retries are acknowledged and dropped.
+            incident_id = await webhook_spool.accept(payload_data)
+            if incident_id:
+                await webhook_handler.enqueue_event(
+                    discord_client=discord_client,
+                    webhook_event={"incident_id": incident_id},
+                )
 
         else:
             raise ValueError("The provided data does not match the expected schema.")
@@ -102,15 +256,18 @@ async def connecting_event_endpoint(request, discord_client):
 
 
 async def webhook_health_check(task_memory, discord_client):
-    webhook_server = task_memory.get("webhook_server")
-    if not webhook_server:
-        webhook_server = await start_webhook(discord_client=discord_client)
-        task_memory["webhook_server"] = webhook_server
+    webhook_listener = task_memory.get("webhook_listener")
+    if not webhook_listener:
+        webhook_listener = await start_webhook(discord_client=discord_client)
+        task_memory["webhook_listener"] = webhook_listener
 
     else:
-        if webhook_server.is_serving():
+        if webhook_listener["server"].is_serving():
             logger.info("Webhook server is currently running.")
 
         else:
-            del task_memory["webhook_server"]
-            await webhook_health_check(discord_client, task_memory)
+            del task_memory["webhook_listener"]
+            await webhook_listener["runner"].cleanup()
+            await webhook_health_check(
+                task_memory=task_memory, discord_client=discord_client
+            )